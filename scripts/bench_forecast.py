@@ -0,0 +1,74 @@
+"""
+Benchmark for forecast: fitting every series at once should take seconds on
+one core, and a warm-started daily update should cost a few steps.
+
+Builds synthetic histories shaped like BI data (weekday prices, random
+walks with a weekly pattern) for every (commodity, province, market)
+series, then times a cold fit over INIT_DAYS days and one warm daily
+update with its forecasts.
+
+Usage: python scripts/bench_forecast.py [--series 1428] [--repeat 3]
+"""
+
+import time
+import argparse
+from datetime import date, timedelta
+
+import numpy as np
+
+from forecast import HORIZON, INIT_DAYS, PARAM_GRID, SmoothingState, advance
+
+
+def synthetic_prices(series, days, seed=42):
+    """(series, days) random-walk prices, NaN on weekends like BI's calendar."""
+    rng = np.random.default_rng(seed)
+    end = date(2026, 1, 1)
+    calendar = [end - timedelta(days=days - 1 - i) for i in range(days)]
+    start = rng.uniform(10_000, 120_000, size=(series, 1))
+    walk = np.cumprod(1 + rng.normal(0, 0.01, size=(series, days)), axis=1)
+    weekly = 1 + 0.01 * np.sin(2 * np.pi * np.array([d.weekday() for d in calendar]) / 7)
+    prices = start * walk * weekly
+    prices[:, [d.weekday() >= 5 for d in calendar]] = np.nan
+    return prices, calendar
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched forecasting")
+    parser.add_argument("--series", type=int, default=1428, help="Series count (default: 34 provinces x 21 commodities x 2 markets)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions, best is reported")
+    args = parser.parse_args()
+
+    prices, calendar = synthetic_prices(args.series, INIT_DAYS + 1)
+    before = [calendar[0] - timedelta(days=1)] * args.series
+
+    def cold_fit():
+        state = SmoothingState(args.series)
+        advance(state, before, prices[:, :-1], calendar[:-1])
+        return state
+
+    fit_time, state = timed(cold_fit, args.repeat)
+
+    def daily_update():
+        warm = state.copy()
+        advance(warm, [calendar[-2]] * args.series, prices[:, -1:], calendar[-1:])
+        return warm.forecast(calendar[-1], HORIZON)
+
+    update_time, (forecasts, rmse) = timed(daily_update, args.repeat)
+
+    print(f"{args.series} series x {len(PARAM_GRID)} parameter sets, horizon {HORIZON} days")
+    print(f"cold fit ({INIT_DAYS} days)      {fit_time:>8.3f} s")
+    print(f"warm daily update + forecast  {update_time * 1000:>8.1f} ms")
+    print(f"median one-step RMSE          {np.nanmedian(rmse / np.nanmean(prices, axis=1)):>8.2%} of price")
+
+
+if __name__ == "__main__":
+    main()
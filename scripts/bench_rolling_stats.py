@@ -0,0 +1,77 @@
+"""
+Benchmark for rolling_stats: the cost of one daily price_stats update should
+stay flat as the stored history grows.
+
+Builds synthetic histories for every (commodity, province) series, streams
+them once to produce the stored stats state, then times a single day's
+incremental update using only the prices required_ranges() asks for.
+
+Usage: python scripts/bench_rolling_stats.py [--series 714] [--repeat 5]
+"""
+
+import time
+import random
+import argparse
+from datetime import date, timedelta
+
+from rolling_stats import SeriesState, compute_stats, required_ranges
+
+HISTORY_YEARS = (1, 3, 5, 10)
+
+
+def synthetic_history(series, days, seed=42):
+    """Random-walk prices on ~5 of every 7 days, like BI's trading calendar."""
+    rng = random.Random(seed)
+    end = date(2026, 1, 1)
+    calendar = [end - timedelta(days=i) for i in range(days)][::-1]
+    calendar = [d for d in calendar if d.weekday() < 5]
+    history = {}
+    for s in range(series):
+        price = rng.uniform(10_000, 120_000)
+        prices = {}
+        for d in calendar:
+            price *= 1 + rng.gauss(0, 0.01)
+            prices[d] = round(price)
+        history[(s // 34 + 1, str(11 + s % 34))] = prices
+    return history, calendar
+
+
+def bench(series, years, repeat):
+    history, calendar = synthetic_history(series, years * 365)
+    day, prev = calendar[-1], calendar[-2]
+
+    # Stored state as of the previous trading day (setup, not timed)
+    rows = compute_stats(history, {}, prev, prev)
+    seeds = {(r["commodity_id"], r["province_id"]): SeriesState.from_row(r) for r in rows}
+
+    ranges = required_ranges(day, day, {s.last_date for s in seeds.values()}, False)
+    needed = {
+        key: {d: p for d, p in prices.items() if any(lo <= d <= hi for lo, hi in ranges)}
+        for key, prices in history.items()
+    }
+    rows_read = sum(len(p) for p in needed.values())
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        compute_stats(needed, seeds, day, day)
+        best = min(best, time.perf_counter() - t0)
+
+    stored = sum(len(p) for p in history.values())
+    print(f"{years:>6}y  {stored:>13,}  {rows_read:>11,}  {best * 1000:>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark daily price_stats maintenance")
+    parser.add_argument("--series", type=int, default=714, help="Series count (default: 34 provinces x 21 commodities)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions, best is reported")
+    args = parser.parse_args()
+
+    print(f"Daily price_stats update, {args.series} series")
+    print("history  stored prices  prices read  update time")
+    for years in HISTORY_YEARS:
+        bench(args.series, years, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
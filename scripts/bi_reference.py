@@ -0,0 +1,158 @@
+"""
+Reference mappings for Bank Indonesia PIHPS: BI province/commodity/market
+identifiers to our BPS province codes, commodity slugs and market types.
+Shared by the scraper, the backfill and the fetch planner.
+"""
+
+BASE_URL = "https://www.bi.go.id/hargapangan"
+
+# BI PIHPS internal province ID -> BPS province code mapping
+# BI uses its own numbering; BPS uses the official province codes
+BI_TO_BPS_PROVINCE = {
+    1: "11",    # Aceh
+    2: "12",    # Sumatera Utara
+    3: "13",    # Sumatera Barat
+    4: "14",    # Riau
+    5: "21",    # Kepulauan Riau
+    6: "15",    # Jambi
+    7: "17",    # Bengkulu
+    8: "16",    # Sumatera Selatan
+    9: "19",    # Kep. Bangka Belitung
+    10: "18",   # Lampung
+    11: "36",   # Banten
+    12: "32",   # Jawa Barat
+    13: "31",   # DKI Jakarta
+    14: "33",   # Jawa Tengah
+    15: "34",   # DI Yogyakarta
+    16: "35",   # Jawa Timur
+    17: "51",   # Bali
+    18: "52",   # Nusa Tenggara Barat
+    19: "53",   # Nusa Tenggara Timur
+    20: "61",   # Kalimantan Barat
+    21: "63",   # Kalimantan Selatan
+    22: "62",   # Kalimantan Tengah
+    23: "64",   # Kalimantan Timur
+    24: "65",   # Kalimantan Utara
+    25: "75",   # Gorontalo
+    26: "73",   # Sulawesi Selatan
+    27: "74",   # Sulawesi Tenggara
+    28: "72",   # Sulawesi Tengah
+    29: "71",   # Sulawesi Utara
+    30: "76",   # Sulawesi Barat
+    31: "81",   # Maluku
+    32: "82",   # Maluku Utara
+    33: "91",   # Papua
+    34: "92",   # Papua Barat
+}
+
+# BI commodity names -> our commodity slug mapping
+COMMODITY_SLUG_MAP = {
+    "Bawang Merah Ukuran Sedang": "bawang-merah-ukuran-sedang",
+    "Bawang Putih Ukuran Sedang": "bawang-putih-ukuran-sedang",
+    "Beras Kualitas Bawah I": "beras-kualitas-bawah-i",
+    "Beras Kualitas Bawah II": "beras-kualitas-bawah-ii",
+    "Beras Kualitas Medium I": "beras-kualitas-medium-i",
+    "Beras Kualitas Medium II": "beras-kualitas-medium-ii",
+    "Beras Kualitas Super I": "beras-kualitas-super-i",
+    "Beras Kualitas Super II": "beras-kualitas-super-ii",
+    "Cabai Merah Besar": "cabai-merah-besar",
+    "Cabai Merah Keriting": "cabai-merah-keriting",
+    "Cabai Merah Keriting ": "cabai-merah-keriting",  # BI has trailing space
+    "Cabai Rawit Hijau": "cabai-rawit-hijau",
+    "Cabai Rawit Merah": "cabai-rawit-merah",
+    "Daging Ayam Ras Segar": "daging-ayam-ras-segar",
+    "Daging Sapi Kualitas 1": "daging-sapi-kualitas-1",
+    "Daging Sapi Kualitas 2": "daging-sapi-kualitas-2",
+    "Gula Pasir Kualitas Premium": "gula-pasir-kualitas-premium",
+    "Gula Pasir Lokal": "gula-pasir-lokal",
+    "Minyak Goreng Curah": "minyak-goreng-curah",
+    "Minyak Goreng Kemasan Bermerk 1": "minyak-goreng-kemasan-bermerek-1",
+    "Minyak Goreng Kemasan Bermerk 2": "minyak-goreng-kemasan-bermerek-2",
+    "Telur Ayam Ras Segar": "telur-ayam-ras-segar",
+}
+
+# Market type mapping (BI price_type_id -> our market_type)
+MARKET_TYPES = {
+    "1": "traditional",
+    "2": "modern",
+}
+
+
+# BI province names (GetGridDataKomoditas "name" field) -> BPS province code
+PROVINCE_NAME_TO_BPS = {
+    "Aceh": "11", "Sumatera Utara": "12", "Sumatera Barat": "13",
+    "Riau": "14", "Kepulauan Riau": "21", "Jambi": "15",
+    "Bengkulu": "17", "Sumatera Selatan": "16",
+    "Kep. Bangka Belitung": "19", "Kepulauan Bangka Belitung": "19",
+    "Lampung": "18", "Banten": "36", "Jawa Barat": "32",
+    "DKI Jakarta": "31", "Jawa Tengah": "33", "DI Yogyakarta": "34",
+    "Jawa Timur": "35", "Bali": "51", "Nusa Tenggara Barat": "52",
+    "Nusa Tenggara Timur": "53", "Kalimantan Barat": "61",
+    "Kalimantan Selatan": "63", "Kalimantan Tengah": "62",
+    "Kalimantan Timur": "64", "Kalimantan Utara": "65",
+    "Gorontalo": "75", "Sulawesi Selatan": "73", "Sulawesi Tenggara": "74",
+    "Sulawesi Tengah": "72", "Sulawesi Utara": "71", "Sulawesi Barat": "76",
+    "Maluku": "81", "Maluku Utara": "82", "Papua": "91", "Papua Barat": "92",
+}
+
+# GetGridData1 commodity categories -> commodity slugs in that category
+GRID_DATA1_CATEGORIES = {
+    1: [  # Beras
+        "beras-kualitas-bawah-i", "beras-kualitas-bawah-ii",
+        "beras-kualitas-medium-i", "beras-kualitas-medium-ii",
+        "beras-kualitas-super-i", "beras-kualitas-super-ii",
+    ],
+    2: ["daging-ayam-ras-segar"],
+    3: ["daging-sapi-kualitas-1", "daging-sapi-kualitas-2"],
+    4: ["telur-ayam-ras-segar"],
+    5: ["bawang-merah-ukuran-sedang"],
+    6: ["bawang-putih-ukuran-sedang"],
+    7: ["cabai-merah-besar", "cabai-merah-keriting"],
+    8: ["cabai-rawit-hijau", "cabai-rawit-merah"],
+    9: [
+        "minyak-goreng-curah", "minyak-goreng-kemasan-bermerek-1",
+        "minyak-goreng-kemasan-bermerek-2",
+    ],
+    10: ["gula-pasir-kualitas-premium", "gula-pasir-lokal"],
+}
+
+# Commodity slug -> GetGridDataKomoditas comcat_id (from GetRefCommodityAndCategory)
+KOMODITAS_IDS = {
+    "beras-kualitas-bawah-i": "com_1",
+    "beras-kualitas-bawah-ii": "com_2",
+    "beras-kualitas-medium-i": "com_3",
+    "beras-kualitas-medium-ii": "com_4",
+    "beras-kualitas-super-i": "com_5",
+    "beras-kualitas-super-ii": "com_6",
+    "daging-ayam-ras-segar": "com_7",
+    "daging-sapi-kualitas-1": "com_8",
+    "daging-sapi-kualitas-2": "com_9",
+    "telur-ayam-ras-segar": "com_10",
+    "bawang-merah-ukuran-sedang": "com_11",
+    "bawang-putih-ukuran-sedang": "com_12",
+    "cabai-merah-besar": "com_13",
+    "cabai-merah-keriting": "com_14",
+    "cabai-rawit-hijau": "com_15",
+    "cabai-rawit-merah": "com_16",
+    "minyak-goreng-curah": "com_17",
+    "minyak-goreng-kemasan-bermerek-1": "com_18",
+    "minyak-goreng-kemasan-bermerek-2": "com_19",
+    "gula-pasir-kualitas-premium": "com_20",
+    "gula-pasir-lokal": "com_21",
+}
+
+COMMODITY_SLUGS = sorted(KOMODITAS_IDS)
+
+
+def parse_price(value):
+    """Parse a price string like '15,800' or '15800' to a float."""
+    if value is None or value == "" or value == "-" or value == "( - )":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    # Remove commas and whitespace
+    cleaned = str(value).replace(",", "").replace(" ", "").strip()
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
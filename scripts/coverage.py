@@ -0,0 +1,260 @@
+"""
+Per-date coverage summary of the prices table, maintained as rows are written.
+
+One coverage_summary row per (date, market_type, source) holds the distinct
+province and commodity counts, the row count and a bitmap of the
+(commodity, province) cells still missing. Writers OR in the cells they have
+just stored, so the admin dashboard and the scraper's status decisions read a
+single row instead of scanning `prices`.
+
+Bitmap layout: bit (commodity_index * len(province_order) + province_index),
+most significant bit first, hex encoded; commodity_order and province_order
+are stored on the row so it stays decodable when the universe changes.
+
+Usage: python scripts/coverage.py [--days 30]   (rebuild from `prices`)
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from bi_reference import BI_TO_BPS_PROVINCE
+from db_utils import fetch_all, upsert_batches
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CONFLICT = "date,market_type,source"
+
+PROVINCE_ORDER = sorted(BI_TO_BPS_PROVINCE.values())
+
+
+def encode_bitmap(bits, size):
+    """Hex string of `size` bits from a set of set bit positions."""
+    value = 0
+    for bit in bits:
+        value |= 1 << (size - 1 - bit)
+    return format(value, f"0{(size + 7) // 8 * 2}x") if size else ""
+
+
+def decode_bitmap(text, size):
+    """Set bit positions of a hex bitmap written by encode_bitmap()."""
+    if not text or not size:
+        return set()
+    value = int(text, 16)
+    return {bit for bit in range(size) if value >> (size - 1 - bit) & 1}
+
+
+class CoverageSummary:
+    """Present (commodity, province) cells for one (date, market, source)."""
+
+    def __init__(self, day, market_type, source, commodity_order, province_order=PROVINCE_ORDER):
+        self.day = day
+        self.market_type = market_type
+        self.source = source
+        self.commodity_order = list(commodity_order)
+        self.province_order = list(province_order)
+        self.present = set()
+
+    @classmethod
+    def from_row(cls, row, commodity_order, province_order=PROVINCE_ORDER):
+        """Load a stored row, re-laid out onto the current commodity/province order."""
+        summary = cls(row["date"], row["market_type"], row["source"], commodity_order, province_order)
+        old_commodities = row.get("commodity_order") or []
+        old_provinces = row.get("province_order") or []
+        width = len(old_provinces)
+        size = len(old_commodities) * width
+        missing = decode_bitmap(row.get("missing_bitmap"), size)
+        summary.present = {
+            (old_commodities[bit // width], old_provinces[bit % width])
+            for bit in range(size) if bit not in missing
+        }
+        return summary
+
+    def cells(self):
+        """Present cells inside the current layout."""
+        commodities = set(self.commodity_order)
+        provinces = set(self.province_order)
+        return {(c, p) for c, p in self.present if c in commodities and p in provinces}
+
+    def provinces(self):
+        return {p for _, p in self.cells()}
+
+    def commodities(self):
+        return {c for c, _ in self.cells()}
+
+    def missing_cells(self):
+        present = self.cells()
+        return [
+            (c, p) for c in self.commodity_order for p in self.province_order
+            if (c, p) not in present
+        ]
+
+    def to_row(self):
+        width = len(self.province_order)
+        commodity_index = {c: i for i, c in enumerate(self.commodity_order)}
+        province_index = {p: i for i, p in enumerate(self.province_order)}
+        missing_bits = {
+            commodity_index[c] * width + province_index[p] for c, p in self.missing_cells()
+        }
+        cells = self.cells()
+        return {
+            "date": self.day,
+            "market_type": self.market_type,
+            "source": self.source,
+            "province_count": len({p for _, p in cells}),
+            "commodity_count": len({c for c, _ in cells}),
+            "row_count": len(cells),
+            "expected_cells": len(self.commodity_order) * width,
+            "missing_bitmap": encode_bitmap(missing_bits, len(self.commodity_order) * width),
+            "commodity_order": self.commodity_order,
+            "province_order": self.province_order,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+
+def latest_coverage(summaries, source):
+    """
+    Commodities and provinces covered on the latest date `source` wrote,
+    across market types.
+
+    Returns:
+        (set of commodity ids, set of province ids)
+    """
+    days = [day for day, _, src in summaries if src == source]
+    if not days:
+        return set(), set()
+    latest = max(days)
+    commodities, provinces = set(), set()
+    for (day, _, src), summary in summaries.items():
+        if day == latest and src == source:
+            commodities |= summary.commodities()
+            provinces |= summary.provinces()
+    return commodities, provinces
+
+
+class CoverageTracker:
+    """Folds freshly written price records into coverage_summary."""
+
+    def __init__(self, supabase, commodity_order=None, dry_run=False):
+        self.supabase = supabase
+        self.dry_run = dry_run
+        self._commodity_order = sorted(commodity_order) if commodity_order else None
+
+    def commodity_order(self):
+        if self._commodity_order is None:
+            result = self.supabase.table("commodities").select("id").order("id").execute()
+            self._commodity_order = [row["id"] for row in result.data]
+        return self._commodity_order
+
+    def load(self, day, market_type, source="bi"):
+        """The stored summary for one (date, market, source), or None. A single-row read."""
+        result = (
+            self.supabase.table("coverage_summary")
+            .select("*")
+            .eq("date", day)
+            .eq("market_type", market_type)
+            .eq("source", source)
+            .limit(1)
+            .execute()
+        )
+        if not result.data:
+            return None
+        row = result.data[0]
+        # Reading needs no commodities lookup; the row carries its own layout
+        return CoverageSummary.from_row(row, self._commodity_order or row["commodity_order"])
+
+    def update(self, records, replace=False):
+        """
+        Add written records to their summaries and store them.
+
+        Args:
+            records: price records that were just upserted
+            replace: start from empty summaries instead of the stored ones
+                (used by rebuild(), which passes every row of each date)
+
+        Returns:
+            {(date, market_type, source): CoverageSummary}
+        """
+        keys = {(rec["date"], rec["market_type"], rec["source"]) for rec in records}
+        if not keys:
+            return {}
+        if self.dry_run:
+            return self.summarize(records)
+
+        summaries = self.summarize(records, {} if replace else self._load_many(keys))
+        rows = [s.to_row() for s in summaries.values()]
+        written = upsert_batches(self.supabase, "coverage_summary", rows, SUMMARY_CONFLICT)
+        logger.info(f"coverage_summary: {written} rows updated")
+        return summaries
+
+    def summarize(self, records, summaries=None):
+        """Merge records into `summaries` (or fresh ones) in memory, without storing."""
+        summaries = dict(summaries or {})
+        for rec in records:
+            key = (rec["date"], rec["market_type"], rec["source"])
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = CoverageSummary(*key, self.commodity_order())
+            summary.present.add((rec["commodity_id"], rec["province_id"]))
+        return summaries
+
+    def _load_many(self, keys):
+        dates = sorted({day for day, _, _ in keys})
+        rows = fetch_all(lambda: (
+            self.supabase.table("coverage_summary")
+            .select("*")
+            .in_("date", dates)
+            .order("date")
+            .order("market_type")
+            .order("source")
+        ))
+        order = self.commodity_order()
+        return {
+            (row["date"], row["market_type"], row["source"]): CoverageSummary.from_row(row, order)
+            for row in rows
+            if (row["date"], row["market_type"], row["source"]) in keys
+        }
+
+    def rebuild(self, start, end):
+        """Recompute the summaries of [start, end] from `prices`."""
+        rows = fetch_all(lambda: (
+            self.supabase.table("prices")
+            .select("commodity_id, province_id, date, market_type, source")
+            .gte("date", start.strftime("%Y-%m-%d"))
+            .lte("date", end.strftime("%Y-%m-%d"))
+            .order("id")
+        ))
+        logger.info(f"Rebuilding coverage from {len(rows)} price rows ({start} to {end})")
+        return self.update(rows, replace=True)
+
+
+def main():
+    import os
+    import sys
+    import argparse
+
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(description="Rebuild coverage_summary rows from the prices table")
+    parser.add_argument("--days", type=int, default=30, help="How many recent days to rebuild (default: 30)")
+    args = parser.parse_args()
+
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        logger.error("SUPABASE_URL and SUPABASE_KEY required")
+        sys.exit(1)
+
+    end = datetime.now().date()
+    CoverageTracker(create_client(url, key)).rebuild(end - timedelta(days=args.days - 1), end)
+
+
+if __name__ == "__main__":
+    main()
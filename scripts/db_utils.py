@@ -0,0 +1,44 @@
+"""
+Small Supabase helpers shared by the scraping pipeline stages.
+PostgREST caps responses at 1000 rows, so large selects are paginated here.
+"""
+
+import logging
+
+from writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+
+
+def fetch_all(build_query, page_size=PAGE_SIZE):
+    """
+    Run a select query page by page and return every row.
+
+    Args:
+        build_query: zero-argument callable returning a fresh query builder
+            (a builder can only be executed once, so each page needs a new one)
+        page_size: rows per request, must not exceed the PostgREST max rows
+
+    Returns:
+        list of row dicts
+    """
+    rows = []
+    offset = 0
+    while True:
+        result = build_query().range(offset, offset + page_size - 1).execute()
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+    return rows
+
+
+def upsert_batches(supabase, table, records, on_conflict):
+    """
+    Upsert records through a BatchWriter (concurrent, adaptive batches that
+    isolate bad rows). Returns the number of rows written.
+    """
+    return len(BatchWriter(supabase, table, on_conflict).write(records))
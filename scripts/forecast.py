@@ -0,0 +1,331 @@
+"""
+Short-horizon price forecasts for every (commodity, province, market) series.
+
+Each series is modelled with additive Holt-Winters smoothing: a level, a
+damped trend and a 7-day seasonal profile over calendar days (days without
+a BI price only project the state forward). Instead of fitting series one
+by one, every series runs every parameter set of PARAM_GRID at once as
+(parameter set, series) arrays, one vectorized step per day; each series
+then forecasts with the parameter set whose discounted one-step-ahead
+squared error is lowest.
+
+The smoothing state of all parameter sets is stored on the series'
+price_forecasts row, so a daily run warm-starts from it and only steps
+through the days since. State is committed up to the day before the
+latest date — that day may still be filling in as provinces publish — and
+forecasts start from a copy advanced through the latest date.
+
+Usage: python scripts/forecast.py [--rebuild] [--horizon 14]
+"""
+
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db_utils import fetch_all, upsert_batches
+from rolling_stats import to_date
+
+logger = logging.getLogger(__name__)
+
+HORIZON = 14
+SEASON = 7
+
+# Days of history a series without stored state is fitted on
+INIT_DAYS = 180
+
+# Weight of yesterday's squared error in the running error (~50-day memory)
+DISCOUNT = 0.98
+
+# (alpha, beta, gamma, phi): level, trend and season smoothing, trend damping
+PARAM_GRID = [
+    (alpha, beta, 0.1, phi)
+    for alpha in (0.1, 0.3, 0.5, 0.8)
+    for beta in (0.01, 0.1)
+    for phi in (0.9, 0.98)
+]
+
+MARKET_TYPES = ("traditional", "modern")
+
+FORECAST_CONFLICT = "commodity_id,province_id,market_type"
+
+
+class SmoothingState:
+    """
+    Holt-Winters state for S series under K parameter sets.
+
+    level, trend, sse, weight: (K, S); season: (K, S, SEASON) indexed by
+    date.toordinal() % SEASON. A NaN level marks a series not yet started.
+    """
+
+    def __init__(self, n_series, params=PARAM_GRID):
+        k = len(params)
+        self.alpha, self.beta, self.gamma, self.phi = (np.array(col)[:, None] for col in zip(*params))
+        self.level = np.full((k, n_series), np.nan)
+        self.trend = np.zeros((k, n_series))
+        self.season = np.zeros((k, n_series, SEASON))
+        self.sse = np.zeros((k, n_series))
+        self.weight = np.zeros((k, n_series))
+
+    def copy(self):
+        other = SmoothingState.__new__(SmoothingState)
+        other.__dict__ = {name: value.copy() for name, value in self.__dict__.items()}
+        return other
+
+    def load(self, s, row):
+        """Set series `s` from a stored price_forecasts row; null levels load as not started."""
+        k = self.level.shape[0]
+        self.level[:, s] = np.array(row["level"], dtype=float)
+        self.trend[:, s] = np.nan_to_num(np.array(row["trend"], dtype=float))
+        self.season[:, s, :] = np.nan_to_num(np.array(row["season"], dtype=float)).reshape(k, SEASON)
+        self.sse[:, s] = np.nan_to_num(np.array(row["sse"], dtype=float))
+        self.weight[:, s] = np.nan_to_num(np.array(row["weight"], dtype=float))
+
+    def step(self, day, y, active):
+        """
+        Advance every series in `active` by one calendar day.
+
+        Args:
+            y: (S,) observed prices, NaN where none was reported
+            active: (S,) bool, series whose state is before `day`
+        """
+        slot = day.toordinal() % SEASON
+        season = self.season[:, :, slot]
+        projected = self.level + self.phi * self.trend
+        started = ~np.isnan(self.level)
+        observed = active & ~np.isnan(y)
+
+        err = y - (projected + season)
+        level = self.alpha * (y - season) + (1 - self.alpha) * projected
+        trend = self.beta * (level - self.level) + (1 - self.beta) * self.phi * self.trend
+        season_new = self.gamma * (y - level) + (1 - self.gamma) * season
+
+        update = observed & started
+        begin = observed & ~started
+        idle = active & ~observed & started
+
+        self.sse = np.where(update, DISCOUNT * self.sse + err ** 2, self.sse)
+        self.weight = np.where(update, DISCOUNT * self.weight + 1, self.weight)
+        self.season[:, :, slot] = np.where(update, season_new, season)
+        self.trend = np.where(update, trend, np.where(idle, self.phi * self.trend, self.trend))
+        self.level = np.where(
+            update, level,
+            np.where(begin, np.broadcast_to(y, self.level.shape),
+                     np.where(idle, projected, self.level)),
+        )
+
+    def best(self):
+        """(S,) index of the parameter set with the lowest running error."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mse = np.where(self.weight > 0, self.sse / self.weight, np.inf)
+        return mse.argmin(axis=0)
+
+    def forecast(self, day, horizon=HORIZON):
+        """
+        Forecasts for day + 1 .. day + horizon with each series' best set.
+
+        Returns:
+            (S, horizon) forecasts and (S,) one-step RMSE, NaN where unstarted
+        """
+        best = self.best()
+        cols = np.arange(self.level.shape[1])
+        level = self.level[best, cols]
+        trend = self.trend[best, cols]
+        phi = self.phi[best, 0]
+
+        steps = np.arange(1, horizon + 1)
+        damped = np.cumsum(phi[:, None] ** steps[None, :], axis=1)
+        slots = (day.toordinal() + steps) % SEASON
+        season = self.season[best, cols][:, slots]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rmse = np.sqrt(self.sse[best, cols] / self.weight[best, cols])
+        return level[:, None] + trend[:, None] * damped + season, rmse
+
+
+def series_matrix(rows, keys, days):
+    """(S, D) prices for the series `keys` over `days`, sources averaged, NaN where missing."""
+    s_index = {key: i for i, key in enumerate(keys)}
+    d_index = {d: i for i, d in enumerate(days)}
+    sums = np.zeros((len(keys), len(days)))
+    counts = np.zeros((len(keys), len(days)))
+    for r in rows:
+        s = s_index.get((r["commodity_id"], r["province_id"]))
+        d = d_index.get(to_date(r["date"]))
+        if s is None or d is None:
+            continue
+        sums[s, d] += float(r["price"])
+        counts[s, d] += 1
+    with np.errstate(invalid="ignore"):
+        return sums / counts
+
+
+def advance(state, start_dates, prices, days):
+    """Step `state` through `days`; series s only from the day after start_dates[s]."""
+    start_ordinals = np.array([d.toordinal() for d in start_dates])
+    for d, day in enumerate(days):
+        state.step(day, prices[:, d], start_ordinals < day.toordinal())
+
+
+def _round(values):
+    return [round(v, 2) if np.isfinite(v) else None for v in values.tolist()]
+
+
+def _nullable(values):
+    """State values for storage; NaN (a series not started yet) as None."""
+    return [v if np.isfinite(v) else None for v in np.ravel(values).tolist()]
+
+
+class ForecastUpdater:
+    """Refreshes price_forecasts for every series of a market from its stored state."""
+
+    def __init__(self, supabase, horizon=HORIZON):
+        self.supabase = supabase
+        self.horizon = horizon
+
+    def update(self, market_types=MARKET_TYPES, rebuild=False):
+        """Returns the number of price_forecasts rows written."""
+        return sum(self._update_market(m, rebuild) for m in market_types)
+
+    def _update_market(self, market_type, rebuild):
+        as_of = self._latest_date(market_type)
+        if as_of is None:
+            return 0
+        commit_day = as_of - timedelta(days=1)
+        cold_start = as_of - timedelta(days=INIT_DAYS)
+
+        stored = {} if rebuild else self._load_state(market_type, cold_start)
+        start = min([to_date(r["state_date"]) for r in stored.values()] + [commit_day])
+        if self._series_keys(market_type, as_of) - set(stored):
+            start = cold_start
+        days = [start + timedelta(days=i + 1) for i in range((as_of - start).days)]
+
+        rows = fetch_all(lambda: (
+            self.supabase.table("prices")
+            .select("commodity_id, province_id, date, price")
+            .eq("market_type", market_type)
+            .gt("date", start.strftime("%Y-%m-%d"))
+            .lte("date", as_of.strftime("%Y-%m-%d"))
+            .order("id")
+        ))
+        keys = sorted(set(stored) | {(r["commodity_id"], r["province_id"]) for r in rows})
+        prices = series_matrix(rows, keys, days)
+
+        state = SmoothingState(len(keys))
+        start_dates = []
+        for s, key in enumerate(keys):
+            if key in stored:
+                state.load(s, stored[key])
+                start_dates.append(to_date(stored[key]["state_date"]))
+            else:
+                start_dates.append(cold_start)
+
+        # Commit through the previous day, forecast from a copy through today
+        committed = [d for d in days if d <= commit_day]
+        advance(state, start_dates, prices[:, :len(committed)], committed)
+        latest = state.copy()
+        advance(latest, [max(d, commit_day) for d in start_dates], prices[:, len(committed):], days[len(committed):])
+        forecasts, rmse = latest.forecast(as_of, self.horizon)
+        best = latest.best()
+        rmse = _round(rmse)
+
+        now = datetime.utcnow().isoformat()
+        records = []
+        for s, (commodity_id, province_id) in enumerate(keys):
+            if np.isnan(forecasts[s, 0]):
+                continue
+            records.append({
+                "commodity_id": commodity_id,
+                "province_id": province_id,
+                "market_type": market_type,
+                "date": as_of.strftime("%Y-%m-%d"),
+                "forecast": _round(forecasts[s]),
+                "rmse": rmse[s],
+                "params": list(PARAM_GRID[best[s]]),
+                "state_date": max(start_dates[s], commit_day).strftime("%Y-%m-%d"),
+                # A series first priced on as_of has no committed state yet:
+                # its level is stored as nulls and it starts on the next run
+                "level": _nullable(state.level[:, s]),
+                "trend": _nullable(state.trend[:, s]),
+                "season": _nullable(state.season[:, s, :]),
+                "sse": _nullable(state.sse[:, s]),
+                "weight": _nullable(state.weight[:, s]),
+                "updated_at": now,
+            })
+
+        written = upsert_batches(self.supabase, "price_forecasts", records, FORECAST_CONFLICT)
+        logger.info(
+            f"price_forecasts ({market_type}): {written} series as of {as_of}, "
+            f"{len(days)} days stepped, {len(keys) - len(stored)} cold-started"
+        )
+        return written
+
+    def _latest_date(self, market_type):
+        result = (
+            self.supabase.table("prices")
+            .select("date")
+            .eq("market_type", market_type)
+            .order("date", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return to_date(result.data[0]["date"]) if result.data else None
+
+    def _series_keys(self, market_type, as_of):
+        """Series with a price on the latest date."""
+        rows = fetch_all(lambda: (
+            self.supabase.table("prices")
+            .select("commodity_id, province_id")
+            .eq("market_type", market_type)
+            .eq("date", as_of.strftime("%Y-%m-%d"))
+            .order("id")
+        ))
+        return {(r["commodity_id"], r["province_id"]) for r in rows}
+
+    def _load_state(self, market_type, oldest):
+        """Stored state per series; state older than the cold-start window is refitted."""
+        rows = fetch_all(lambda: (
+            self.supabase.table("price_forecasts")
+            .select("commodity_id, province_id, state_date, level, trend, season, sse, weight")
+            .eq("market_type", market_type)
+            .gte("state_date", oldest.strftime("%Y-%m-%d"))
+            .order("commodity_id")
+            .order("province_id")
+        ))
+        return {
+            (r["commodity_id"], r["province_id"]): r
+            for r in rows
+            if len(r["level"]) == len(PARAM_GRID)
+        }
+
+
+def main():
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    parser = argparse.ArgumentParser(description="Refresh short-horizon price forecasts")
+    parser.add_argument("--rebuild", action="store_true", help=f"Ignore stored state and refit on {INIT_DAYS} days")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help=f"Days to forecast (default: {HORIZON})")
+    args = parser.parse_args()
+
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        logger.error("SUPABASE_URL and SUPABASE_KEY required")
+        sys.exit(1)
+
+    ForecastUpdater(create_client(url, key), args.horizon).update(rebuild=args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
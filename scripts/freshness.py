@@ -0,0 +1,82 @@
+"""
+Publication freshness probe for BI PIHPS.
+
+One GetGridData1 request for a single-commodity category per (market, date)
+shows which provinces BI has published. Comparing that with the provinces we
+already store for the same commodity tells whether a scrape is needed at all
+and, if so, which provinces are new — so the full fetch only covers the newly
+published slices. The probe's own rows are kept, not thrown away.
+"""
+
+import logging
+
+from bi_reference import BI_TO_BPS_PROVINCE, GRID_DATA1_CATEGORIES, MARKET_TYPES
+from coverage import CoverageTracker
+from planner import GRID_DATA1, PlannedRequest
+
+logger = logging.getLogger(__name__)
+
+# Daging Ayam Ras Segar: a single commodity reported by nearly every province
+PROBE_CATEGORY = 2
+PROBE_COMMODITY = GRID_DATA1_CATEGORIES[PROBE_CATEGORY][0]
+
+# A (market, date) slice counts as complete at this share of provinces
+COMPLETE_RATIO = 0.9
+
+
+class ProbeResult:
+    """What BI has published for one (market, date) versus what is stored."""
+
+    def __init__(self, market_type_id, day, published, stored):
+        self.market_type_id = market_type_id
+        self.day = day
+        self.published = set(published)
+        self.stored = set(stored)
+
+    @property
+    def new_provinces(self):
+        return sorted(self.published - self.stored)
+
+    @property
+    def completeness(self):
+        return len(self.published) / len(BI_TO_BPS_PROVINCE)
+
+    @property
+    def complete(self):
+        """Published widely enough and everything published is stored."""
+        return self.completeness >= COMPLETE_RATIO and not self.new_provinces
+
+    def summary(self):
+        return (
+            f"{MARKET_TYPES[self.market_type_id]} {self.day:%Y-%m-%d}: "
+            f"{len(self.published)}/{len(BI_TO_BPS_PROVINCE)} provinces published "
+            f"({self.completeness:.0%}), {len(self.new_provinces)} new"
+        )
+
+
+def probe_request(market_type_id, day):
+    """The single request that probes one (market, date)."""
+    return PlannedRequest(GRID_DATA1, market_type_id, day, day, PROBE_CATEGORY)
+
+
+def stored_provinces(supabase, commodity_id, market_type, day, source="bi"):
+    """Provinces already stored for the probe commodity on `day`, from its coverage_summary row."""
+    if supabase is None or commodity_id is None:
+        return set()
+    summary = CoverageTracker(supabase).load(day.strftime("%Y-%m-%d"), market_type, source)
+    if summary is None:
+        return set()
+    return {p for c, p in summary.cells() if c == commodity_id}
+
+
+def evaluate_probe(supabase, commodity_ids, market_type_id, day, records):
+    """
+    Build the ProbeResult for a probe response.
+
+    Args:
+        records: parsed price records of the probe request
+    """
+    commodity_id = commodity_ids.get(PROBE_COMMODITY)
+    published = {r["province_id"] for r in records if r["commodity_id"] == commodity_id}
+    stored = stored_provinces(supabase, commodity_id, MARKET_TYPES[market_type_id], day)
+    return ProbeResult(market_type_id, day, published, stored)
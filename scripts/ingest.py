@@ -0,0 +1,240 @@
+"""
+Multi-source ingestion runner.
+
+Runs every registered price source concurrently — one thread per source,
+each paced by its own rate limit — and funnels their record batches into a
+single write pipeline, so adding a feed does not add its runtime to the
+daily job. After the pipeline drains, rolling stats, the per-date coverage
+summary and the province gap matrices are refreshed for the rows written,
+and one scrape_logs row is recorded per source.
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from coverage import CoverageTracker, latest_coverage
+from province_gaps import ProvinceGapUpdater
+from rolling_stats import PriceStatsUpdater
+from sources.base import RateLimiter, RecordBatch
+from writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+PRICES_CONFLICT = "commodity_id,province_id,date,market_type,source"
+
+# A source covering fewer provinces than this is logged as partial
+MIN_PROVINCES = 20
+
+
+class WritePipeline:
+    """
+    Single consumer of every source's record batches. Deduplicates on the
+    prices conflict key and hands pending rows to a BatchWriter once enough
+    have accumulated.
+    """
+
+    def __init__(self, supabase, dry_run=False, flush_size=5000):
+        self.supabase = supabase
+        self.dry_run = dry_run
+        self.flush_size = flush_size
+        self.writer = None if dry_run else BatchWriter(supabase, "prices", PRICES_CONFLICT)
+        self.queue = queue.Queue(maxsize=256)
+        self.written = []  # records successfully upserted, for the stats refresh
+        self.failed = Counter()  # source -> rows not written (transient or fatal errors)
+        self.quarantined = Counter()  # source -> rows rejected on their own
+        self.error = None  # last error that stopped a write, if any
+        self._pending = {}
+
+    def consume(self):
+        """
+        Drain the queue until the None sentinel arrives. Never raises: sources
+        block on the bounded queue, so a dead consumer would hang the run.
+        """
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            try:
+                for rec in batch.records:
+                    key = (rec["commodity_id"], rec["province_id"], rec["date"], rec["market_type"], rec["source"])
+                    self._pending[key] = rec  # keep the last one for each unique key
+                if len(self._pending) >= self.flush_size:
+                    self.flush()
+            except Exception as e:
+                logger.exception(f"Write pipeline failed on a batch from {batch.source}: {e}")
+                self.error = str(e)
+        try:
+            self.flush()
+        except Exception as e:
+            logger.exception(f"Write pipeline failed on the final flush: {e}")
+            self.error = str(e)
+
+    def flush(self):
+        records = list(self._pending.values())
+        self._pending = {}
+        if not records:
+            return
+        if self.dry_run:
+            self.written.extend(records)
+            logger.info(f"[dry run] Would upsert {len(records)} records")
+            return
+
+        try:
+            result = self.writer.write(records)
+        except Exception:
+            self.failed.update(rec["source"] for rec in records)
+            raise
+        self.written.extend(result.written)
+        self.failed.update(rec["source"] for rec in result.failed)
+        self.quarantined.update(rec["source"] for rec, _ in result.quarantined)
+        if result.error:
+            self.error = result.error
+
+    def problems(self, source, records_sent):
+        """Write problems of one source for its scrape log, or None."""
+        problems = []
+        if self.failed[source]:
+            problems.append(f"{self.failed[source]} rows failed to write")
+        if self.quarantined[source]:
+            problems.append(f"{self.quarantined[source]} rows quarantined")
+        # Errors that stopped a write cannot be traced to one source
+        if self.error and records_sent:
+            problems.append(f"write error: {self.error}")
+        return "; ".join(problems) or None
+
+    def rows_by_source(self):
+        return Counter(rec["source"] for rec in self.written)
+
+
+class IngestionRunner:
+    """Runs price sources in parallel into one write pipeline."""
+
+    def __init__(self, supabase, sources, dry_run=False):
+        self.supabase = supabase
+        self.sources = sources
+        self.dry_run = dry_run
+        self.written = []  # records written by the last run()
+
+    def run(self, context):
+        """
+        Run every source for `context` and wait for all writes.
+
+        Returns:
+            {source name: scrape_logs row dict}
+        """
+        pipeline = WritePipeline(self.supabase, dry_run=self.dry_run)
+        writer = threading.Thread(target=pipeline.consume, name="write-pipeline")
+        writer.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(len(self.sources), 1), thread_name_prefix="source") as pool:
+                list(pool.map(lambda s: self._run_source(s, context, pipeline.queue), self.sources))
+        finally:
+            pipeline.queue.put(None)
+            writer.join()
+
+        if pipeline.written and not self.dry_run:
+            try:
+                PriceStatsUpdater(self.supabase).update(pipeline.written)
+            except Exception as e:
+                logger.error(f"Price stats update failed: {e}")
+            try:
+                ProvinceGapUpdater(self.supabase).update(rec["market_type"] for rec in pipeline.written)
+            except Exception as e:
+                logger.error(f"Province gap update failed: {e}")
+
+        self.written = pipeline.written
+        summaries = self._update_coverage(context, pipeline.written)
+        written = pipeline.rows_by_source()
+        results = {}
+        for source in self.sources:
+            health = source.health()
+            rows = written[source.name]
+            # The day's stored coverage, so a run that only filled in newly
+            # published provinces is judged on the whole day
+            commodities, provinces = map(len, latest_coverage(summaries, source.name))
+            write_problems = pipeline.problems(source.name, health.records)
+            error = "; ".join(e for e in (health.error, write_problems) if e) or None
+            status = "success" if rows > 0 and not health.error else "failed"
+            if status == "success" and (provinces < MIN_PROVINCES or health.failures or error):
+                status = "partial"
+            if rows == 0 and health.skipped and not health.error:
+                logger.info(f"{health.summary()} -> up to date, nothing to write")
+                continue
+
+            results[source.name] = {
+                "scrape_date": str(context.today),
+                "source": source.name,
+                "status": status,
+                "commodities_scraped": commodities,
+                "provinces_scraped": provinces,
+                "rows_inserted": rows,
+                "error_message": error,
+                "duration_seconds": round(health.duration, 2),
+            }
+            logger.info(f"{health.summary()} -> {status}, {rows} rows written")
+            if not self.dry_run:
+                self._log_scrape(results[source.name])
+        return results
+
+    def _update_coverage(self, context, records):
+        """Fold the written rows into coverage_summary; returns the updated summaries."""
+        tracker = CoverageTracker(self.supabase, context.commodity_ids.values(), dry_run=self.dry_run)
+        try:
+            return tracker.update(records)
+        except Exception as e:
+            logger.error(f"Coverage summary update failed: {e}")
+            return tracker.summarize(records)
+
+    def _run_source(self, source, context, out):
+        """Drive one source through setup, plan, fetch and parse on this thread."""
+        health = source.health()
+        health.started_at = time.time()
+        limiter = RateLimiter(source.min_interval)
+        try:
+            if not source.setup(context):
+                health.error = "Session init failed"
+                return
+
+            for unit in source.plan(context):
+                limiter.wait()
+                health.requests += 1
+                try:
+                    payload = source.fetch(unit)
+                except Exception as e:
+                    logger.error(f"[{source.name}] fetch failed for {unit!r}: {e}")
+                    payload = None
+                if payload is None:
+                    health.failures += 1
+                    continue
+
+                try:
+                    records = source.parse(unit, payload)
+                except Exception as e:
+                    logger.error(f"[{source.name}] parse failed for {unit!r}: {e}")
+                    health.failures += 1
+                    continue
+
+                if records:
+                    health.records += len(records)
+                    out.put(RecordBatch(source.name, unit, records))
+        except Exception as e:
+            logger.exception(f"[{source.name}] aborted: {e}")
+            health.error = str(e)
+        finally:
+            try:
+                source.teardown()
+            except Exception as e:
+                logger.error(f"[{source.name}] teardown failed: {e}")
+            health.finished_at = time.time()
+
+    def _log_scrape(self, row):
+        """Log one source's scrape result to the database."""
+        try:
+            self.supabase.table("scrape_logs").insert(row).execute()
+        except Exception as e:
+            logger.error(f"Failed to log scrape: {e}")
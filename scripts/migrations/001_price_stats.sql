@@ -0,0 +1,45 @@
+-- Rolling price statistics maintained by scripts/rolling_stats.py.
+-- One row per (commodity, province, market, date); province_id '00' holds the
+-- national series. n_/sum_/sumsq_ columns are the running window state the
+-- next day's row is derived from.
+
+CREATE TABLE IF NOT EXISTS price_stats (
+  commodity_id  integer      NOT NULL REFERENCES commodities(id),
+  province_id   text         NOT NULL,
+  market_type   text         NOT NULL,
+  date          date         NOT NULL,
+  price         numeric(12,2) NOT NULL,
+
+  n_7           integer      NOT NULL DEFAULT 0,
+  sum_7         double precision NOT NULL DEFAULT 0,
+  sumsq_7       double precision NOT NULL DEFAULT 0,
+  ma_7          numeric(12,2),
+  std_7         numeric(12,2),
+
+  n_30          integer      NOT NULL DEFAULT 0,
+  sum_30        double precision NOT NULL DEFAULT 0,
+  sumsq_30      double precision NOT NULL DEFAULT 0,
+  ma_30         numeric(12,2),
+  std_30        numeric(12,2),
+
+  n_90          integer      NOT NULL DEFAULT 0,
+  sum_90        double precision NOT NULL DEFAULT 0,
+  sumsq_90      double precision NOT NULL DEFAULT 0,
+  ma_90         numeric(12,2),
+  std_90        numeric(12,2),
+
+  change_wow    numeric(8,2),
+  change_mom    numeric(8,2),
+  change_yoy    numeric(8,2),
+
+  updated_at    timestamptz  NOT NULL DEFAULT now(),
+  PRIMARY KEY (commodity_id, province_id, market_type, date)
+);
+
+CREATE INDEX IF NOT EXISTS price_stats_market_date_idx
+  ON price_stats (market_type, date);
+
+ALTER TABLE price_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "price_stats are publicly readable"
+  ON price_stats FOR SELECT USING (true);
@@ -0,0 +1,37 @@
+-- Revision audit state maintained by scripts/revisions.py.
+
+-- Content hash of the normalized upstream response per (province, market,
+-- 7-day chunk). chunk_start is always a Monday.
+CREATE TABLE IF NOT EXISTS upstream_fingerprints (
+  source       text        NOT NULL,
+  province_id  text        NOT NULL,
+  market_type  text        NOT NULL,
+  chunk_start  date        NOT NULL,
+  chunk_end    date        NOT NULL,
+  hash         text        NOT NULL,
+  checked_at   timestamptz NOT NULL DEFAULT now(),
+  changed_at   timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (source, province_id, market_type, chunk_start)
+);
+
+-- Every retroactive change BI made to a price we had already stored.
+CREATE TABLE IF NOT EXISTS price_revisions (
+  id            bigserial    PRIMARY KEY,
+  commodity_id  integer      NOT NULL REFERENCES commodities(id),
+  province_id   text         NOT NULL,
+  market_type   text         NOT NULL,
+  date          date         NOT NULL,
+  source        text         NOT NULL,
+  old_price     numeric(12,2) NOT NULL,
+  new_price     numeric(12,2) NOT NULL,
+  detected_at   timestamptz  NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS price_revisions_lookup_idx
+  ON price_revisions (commodity_id, province_id, market_type, date);
+
+ALTER TABLE upstream_fingerprints ENABLE ROW LEVEL SECURITY;
+ALTER TABLE price_revisions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "price_revisions are publicly readable"
+  ON price_revisions FOR SELECT USING (true);
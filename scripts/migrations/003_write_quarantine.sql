@@ -0,0 +1,15 @@
+-- Rows rejected on their own by scripts/writer.py after bisecting a failed
+-- batch. Inspect, fix and re-upsert by hand; nothing reads this automatically.
+
+CREATE TABLE IF NOT EXISTS write_quarantine (
+  id            bigserial   PRIMARY KEY,
+  target_table  text        NOT NULL,
+  record        jsonb       NOT NULL,
+  error         text        NOT NULL,
+  created_at    timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS write_quarantine_created_idx
+  ON write_quarantine (created_at DESC);
+
+ALTER TABLE write_quarantine ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,28 @@
+-- Per-date coverage of the prices table, maintained by scripts/coverage.py
+-- as the pipeline writes. One row per (date, market_type, source).
+-- missing_bitmap is hex; bit (commodity_index * cardinality(province_order)
+-- + province_index), most significant first, is set when that
+-- (commodity, province) cell has no price yet.
+
+CREATE TABLE IF NOT EXISTS coverage_summary (
+  date             date        NOT NULL,
+  market_type      text        NOT NULL,
+  source           text        NOT NULL,
+  province_count   integer     NOT NULL DEFAULT 0,
+  commodity_count  integer     NOT NULL DEFAULT 0,
+  row_count        integer     NOT NULL DEFAULT 0,
+  expected_cells   integer     NOT NULL DEFAULT 0,
+  missing_bitmap   text        NOT NULL DEFAULT '',
+  commodity_order  integer[]   NOT NULL DEFAULT '{}',
+  province_order   text[]      NOT NULL DEFAULT '{}',
+  updated_at       timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (date, market_type, source)
+);
+
+CREATE INDEX IF NOT EXISTS coverage_summary_latest_idx
+  ON coverage_summary (market_type, source, date DESC);
+
+ALTER TABLE coverage_summary ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "coverage_summary is publicly readable"
+  ON coverage_summary FOR SELECT USING (true);
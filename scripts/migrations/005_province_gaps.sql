@@ -0,0 +1,24 @@
+-- All-pairs province price gaps maintained by scripts/province_gaps.py.
+-- One row per (market_type, commodity); only the latest cross-section is
+-- kept. diff, pct_gap and avg_gap_30 are province_order x province_order
+-- matrices flattened row-major: the gap of province i over province j is
+-- at index i * cardinality(province_order) + j (0-based). NULL where either
+-- province has no recent price.
+
+CREATE TABLE IF NOT EXISTS province_gaps (
+  market_type     text        NOT NULL,
+  commodity_id    integer     NOT NULL REFERENCES commodities(id),
+  date            date        NOT NULL,
+  province_order  text[]      NOT NULL,
+  latest_prices   double precision[] NOT NULL,
+  diff            double precision[] NOT NULL,
+  pct_gap         double precision[] NOT NULL,
+  avg_gap_30      double precision[] NOT NULL,
+  updated_at      timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (market_type, commodity_id)
+);
+
+ALTER TABLE province_gaps ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "province_gaps are publicly readable"
+  ON province_gaps FOR SELECT USING (true);
@@ -0,0 +1,31 @@
+-- Short-horizon forecasts maintained by scripts/forecast.py. One row per
+-- (commodity, province, market): forecast[h - 1] is the projected price for
+-- date + h days. level/trend/sse/weight hold one value per parameter set
+-- of forecast.PARAM_GRID and season their 7-day profiles flattened; they are
+-- the smoothing state as of state_date the next run warm-starts from; a
+-- null level means the series had no price up to state_date yet.
+
+CREATE TABLE IF NOT EXISTS price_forecasts (
+  commodity_id  integer      NOT NULL REFERENCES commodities(id),
+  province_id   text         NOT NULL,
+  market_type   text         NOT NULL,
+  date          date         NOT NULL,
+  forecast      double precision[] NOT NULL,
+  rmse          double precision,
+  params        double precision[] NOT NULL,
+
+  state_date    date         NOT NULL,
+  level         double precision[] NOT NULL,
+  trend         double precision[] NOT NULL,
+  season        double precision[] NOT NULL,
+  sse           double precision[] NOT NULL,
+  weight        double precision[] NOT NULL,
+
+  updated_at    timestamptz  NOT NULL DEFAULT now(),
+  PRIMARY KEY (commodity_id, province_id, market_type)
+);
+
+ALTER TABLE price_forecasts ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "price_forecasts are publicly readable"
+  ON price_forecasts FOR SELECT USING (true);
@@ -0,0 +1,500 @@
+"""
+Fetch planner for BI PIHPS price data.
+
+The same prices can be fetched through three endpoints, each slicing the
+(dates x provinces x commodities) cube differently:
+
+    GetGridData1          one date x one commodity category, all provinces
+    GetGridDataDaerah     one province x a date range, all commodities
+    GetGridDataKomoditas  one commodity x a date range, all provinces
+
+A single day is cheapest through GetGridData1 (10 requests per market),
+while a 90-day backfill is far cheaper per commodity (63 requests instead of
+~900). The planner prices every decomposition with per-endpoint cost models
+(latency plus bytes per returned cell) and picks the cheapest; the executor
+runs the plan and refines the cost models from what it observes.
+"""
+
+import os
+import json
+import time
+import logging
+from collections import namedtuple
+from datetime import date, datetime
+
+import requests
+
+from bi_reference import (
+    BASE_URL,
+    BI_TO_BPS_PROVINCE,
+    COMMODITY_SLUG_MAP,
+    COMMODITY_SLUGS,
+    GRID_DATA1_CATEGORIES,
+    KOMODITAS_IDS,
+    MARKET_TYPES,
+    PROVINCE_NAME_TO_BPS,
+    parse_price,
+)
+
+logger = logging.getLogger(__name__)
+
+GRID_DATA1 = "GetGridData1"
+DAERAH = "GetGridDataDaerah"
+KOMODITAS = "GetGridDataKomoditas"
+
+# Politeness delay between requests — paid on every request, whatever its size
+REQUEST_DELAY = 1.5
+
+# Link throughput used to trade request count against response bytes
+THROUGHPUT = 250_000  # bytes/s
+
+# Learned models; the scheduled workflows carry this file between runs with
+# the Actions cache, since every run starts from a fresh checkout
+COST_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endpoint_costs.json")
+
+PROVINCE_COUNT = len(BI_TO_BPS_PROVINCE)
+BPS_TO_BI_PROVINCE = {bps: bi for bi, bps in BI_TO_BPS_PROVINCE.items()}
+SLUG_TO_CATEGORY = {
+    slug: cat_id for cat_id, slugs in GRID_DATA1_CATEGORIES.items() for slug in slugs
+}
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class EndpointCost:
+    """
+    Cost model of one endpoint: a fixed latency and response overhead per
+    request plus a size per returned price cell (date x province x commodity).
+    """
+
+    def __init__(self, endpoint, latency, request_bytes, cell_bytes, max_days):
+        self.endpoint = endpoint
+        self.latency = latency
+        self.request_bytes = request_bytes
+        self.cell_bytes = cell_bytes
+        self.max_days = max_days
+
+    def request_seconds(self):
+        """Time cost of one request, excluding its cells."""
+        return self.latency + REQUEST_DELAY + self.request_bytes / THROUGHPUT
+
+    def cell_seconds(self):
+        return self.cell_bytes / THROUGHPUT
+
+    def response_bytes(self, cells):
+        return self.request_bytes + cells * self.cell_bytes
+
+    def observe(self, cells, nbytes, seconds, weight=0.2):
+        """Blend one measured response into the model (exponential moving average)."""
+        self.latency += weight * (seconds - self.latency)
+        if cells > 0:
+            per_cell = max(nbytes - self.request_bytes, 0) / cells
+            self.cell_bytes += weight * (per_cell - self.cell_bytes)
+        else:
+            self.request_bytes += weight * (nbytes - self.request_bytes)
+
+    def to_dict(self):
+        return {
+            "latency": round(self.latency, 3),
+            "request_bytes": round(self.request_bytes, 1),
+            "cell_bytes": round(self.cell_bytes, 2),
+            "max_days": self.max_days,
+        }
+
+
+# Measured from BI PIHPS responses (one market, all provinces/commodities).
+# GetGridData1 returns one JSON object per cell; the table endpoints return
+# one '"dd/mm/yyyy": "14,450"' pair per cell. max_days for the table endpoints
+# follows what backfill.py and fetch-bi-data.js have used without timeouts.
+DEFAULT_COST_MODELS = {
+    GRID_DATA1: dict(latency=0.6, request_bytes=300, cell_bytes=150, max_days=1),
+    DAERAH: dict(latency=1.2, request_bytes=400, cell_bytes=23, max_days=7),
+    KOMODITAS: dict(latency=1.5, request_bytes=400, cell_bytes=23, max_days=31),
+}
+
+
+def load_cost_models(path=COST_MODEL_PATH):
+    """Default cost models, overridden by previously observed values if saved."""
+    params = {name: dict(values) for name, values in DEFAULT_COST_MODELS.items()}
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                for name, values in json.load(f).items():
+                    if name in params:
+                        params[name].update(values)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring cost model file {path}: {e}")
+    return {name: EndpointCost(name, **values) for name, values in params.items()}
+
+
+def save_cost_models(models, path=COST_MODEL_PATH):
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({name: m.to_dict() for name, m in models.items()}, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Failed to save cost models: {e}")
+
+
+class Coverage:
+    """The slice of the price cube to fetch. None means everything."""
+
+    def __init__(self, dates, provinces=None, commodities=None, market_type_ids=("1", "2")):
+        self.dates = sorted({_to_date(d) for d in dates})
+        self.provinces = sorted(provinces or BI_TO_BPS_PROVINCE.values())
+        self.commodities = sorted(commodities or COMMODITY_SLUGS)
+        self.market_type_ids = list(market_type_ids)
+
+    def cells(self):
+        return (
+            len(self.dates) * len(self.provinces)
+            * len(self.commodities) * len(self.market_type_ids)
+        )
+
+
+# key is the category id, BI province id or comcat_id, depending on endpoint
+PlannedRequest = namedtuple("PlannedRequest", "endpoint market_type_id start end key")
+
+
+class FetchPlan:
+    """A list of requests against one endpoint with its estimated cost."""
+
+    def __init__(self, endpoint, planned, est_bytes, est_seconds, coverage):
+        self.endpoint = endpoint
+        self.requests = planned
+        self.est_bytes = est_bytes
+        self.est_seconds = est_seconds
+        self.coverage = coverage
+
+    def __len__(self):
+        return len(self.requests)
+
+    def summary(self):
+        return (
+            f"{self.endpoint}: {len(self.requests)} requests, "
+            f"~{self.est_bytes / 1024:.0f} KB, ~{self.est_seconds:.0f}s"
+        )
+
+
+def cover_dates(dates, max_days, request_cost, day_cost):
+    """
+    Split sorted dates into request ranges of at most `max_days` calendar
+    days, minimizing request_cost per range plus day_cost per day spanned.
+
+    Gaps (weekends, holidays, dates already stored) are bridged when that is
+    cheaper than an extra request. Dynamic programming over the dates,
+    O(len(dates) x max_days).
+    """
+    if not dates:
+        return []
+    n = len(dates)
+    best = [0.0] + [float("inf")] * n
+    split = [0] * (n + 1)
+    for j in range(1, n + 1):
+        i = j
+        while i >= 1 and (dates[j - 1] - dates[i - 1]).days < max_days:
+            span = (dates[j - 1] - dates[i - 1]).days + 1
+            cost = best[i - 1] + request_cost + span * day_cost
+            if cost < best[j]:
+                best[j] = cost
+                split[j] = i - 1
+            i -= 1
+
+    ranges = []
+    j = n
+    while j > 0:
+        i = split[j]
+        ranges.append((dates[i], dates[j - 1]))
+        j = i
+    return ranges[::-1]
+
+
+def _plan_grid_data1(coverage, model):
+    categories = sorted({SLUG_TO_CATEGORY[s] for s in coverage.commodities if s in SLUG_TO_CATEGORY})
+    reqs, nbytes = [], 0
+    for market_type_id in coverage.market_type_ids:
+        for d in coverage.dates:
+            for cat_id in categories:
+                reqs.append(PlannedRequest(GRID_DATA1, market_type_id, d, d, cat_id))
+                nbytes += model.response_bytes(PROVINCE_COUNT * len(GRID_DATA1_CATEGORIES[cat_id]))
+    return reqs, nbytes
+
+
+def _plan_ranges(endpoint, coverage, model, keys, cells_per_day):
+    ranges = cover_dates(
+        coverage.dates, model.max_days,
+        model.request_seconds(), cells_per_day * model.cell_seconds(),
+    )
+    reqs, nbytes = [], 0
+    for market_type_id in coverage.market_type_ids:
+        for key in keys:
+            for start, end in ranges:
+                reqs.append(PlannedRequest(endpoint, market_type_id, start, end, key))
+                nbytes += model.response_bytes(((end - start).days + 1) * cells_per_day)
+    return reqs, nbytes
+
+
+def plan_candidates(coverage, models=None):
+    """One plan per endpoint for `coverage`, cheapest first."""
+    models = models or load_cost_models()
+    builders = {
+        GRID_DATA1: lambda m: _plan_grid_data1(coverage, m),
+        DAERAH: lambda m: _plan_ranges(
+            DAERAH, coverage, m,
+            [BPS_TO_BI_PROVINCE[p] for p in coverage.provinces if p in BPS_TO_BI_PROVINCE],
+            len(COMMODITY_SLUGS),
+        ),
+        KOMODITAS: lambda m: _plan_ranges(
+            KOMODITAS, coverage, m,
+            [KOMODITAS_IDS[s] for s in coverage.commodities if s in KOMODITAS_IDS],
+            PROVINCE_COUNT,
+        ),
+    }
+
+    plans = []
+    for endpoint, build in builders.items():
+        model = models[endpoint]
+        reqs, nbytes = build(model)
+        seconds = len(reqs) * (model.latency + REQUEST_DELAY) + nbytes / THROUGHPUT
+        plans.append(FetchPlan(endpoint, reqs, nbytes, seconds, coverage))
+
+    plans.sort(key=lambda p: (p.est_seconds, len(p.requests)))
+    return plans
+
+
+def plan_fetch(coverage, models=None):
+    """The cheapest plan for `coverage`."""
+    plans = plan_candidates(coverage, models)
+    for plan in plans:
+        logger.debug(f"Candidate plan {plan.summary()}")
+    return plans[0]
+
+
+class PlanExecutor:
+    """Runs fetch plans against BI PIHPS and parses responses into price records."""
+
+    def __init__(self, session, commodity_id_cache, models=None):
+        self.session = session
+        self.commodity_id_cache = commodity_id_cache
+        self.models = models or load_cost_models()
+
+    def execute(self, plan):
+        """Run every request of the plan and return all price records."""
+        records = []
+        for _, batch in self.iter_results(plan):
+            records.extend(batch)
+        return records
+
+    def iter_results(self, plan):
+        """Yield (request, records) for each request of the plan, in order."""
+        for i, req in enumerate(plan.requests):
+            records = self.parse(req, self.fetch(req), plan.coverage)
+            logger.info(
+                f"{req.endpoint} {req.key} | {req.start:%m/%d} - {req.end:%m/%d} | "
+                f"{MARKET_TYPES.get(req.market_type_id)} -> {len(records)} records"
+            )
+            yield req, records
+
+            if i < len(plan.requests) - 1:
+                time.sleep(REQUEST_DELAY)  # Be respectful
+
+    def fetch(self, req):
+        """
+        Send one planned request and feed its size and latency back into the
+        endpoint's cost model. Returns the response rows, or None on failure.
+        """
+        rows, nbytes, seconds = self._fetch(req)
+        if rows is not None:
+            self.models[req.endpoint].observe(self._count_cells(req, rows), nbytes, seconds)
+        return rows
+
+    def parse(self, req, rows, coverage=None):
+        """Parse response rows into price records, keeping only `coverage` if given."""
+        records = self._parse(req, rows)
+        if coverage is None:
+            return records
+
+        wanted_dates = {d.strftime("%Y-%m-%d") for d in coverage.dates}
+        wanted_provinces = set(coverage.provinces)
+        wanted_commodities = {
+            self.commodity_id_cache[s] for s in coverage.commodities if s in self.commodity_id_cache
+        }
+        return [
+            r for r in records
+            if r["date"] in wanted_dates
+            and r["province_id"] in wanted_provinces
+            and r["commodity_id"] in wanted_commodities
+        ]
+
+    def save_cost_models(self, path=COST_MODEL_PATH):
+        save_cost_models(self.models, path)
+
+    def _count_cells(self, req, rows):
+        """Price cells in a response, counted the way the cost models are."""
+        if req.endpoint == GRID_DATA1:
+            return len(rows)
+        return sum(1 for row in rows for key in row if str(key).count("/") == 2)
+
+    def _fetch(self, req):
+        """Returns (rows or None on failure, response bytes, elapsed seconds)."""
+        headers = None
+        if req.endpoint == GRID_DATA1:
+            url = f"{BASE_URL}/WebSite/Home/GetGridData1"
+            params = {
+                "tanggal": req.start.strftime("%b %d, %Y"),  # e.g., "Feb 28, 2026"
+                "commodity": str(req.key),
+                "priceType": req.market_type_id,
+                "provId": "0",  # 0 = all provinces
+            }
+        elif req.endpoint == DAERAH:
+            url = f"{BASE_URL}/WebSite/TabelHarga/GetGridDataDaerah"
+            params = {
+                "price_type_id": req.market_type_id,
+                "start_date": req.start.strftime("%Y-%m-%d"),
+                "end_date": req.end.strftime("%Y-%m-%d"),
+                "province_id": str(req.key),
+                "regency_id": "",
+                "market_id": "",
+                "commodity_id": "",
+                "tipe_laporan": "1",
+            }
+        else:
+            url = f"{BASE_URL}/WebSite/TabelHarga/GetGridDataKomoditas"
+            params = {
+                "price_type_id": req.market_type_id,
+                "comcat_id": req.key,
+                "province_id": "",
+                "regency_id": "",
+                "showKota": "false",
+                "showPasar": "false",
+                "tipe_laporan": "1",
+                "start_date": req.start.strftime("%Y-%m-%d"),
+                "end_date": req.end.strftime("%Y-%m-%d"),
+            }
+            page = "PasarTradisionalKomoditas" if req.market_type_id == "1" else "PasarModernKomoditas"
+            headers = {"Referer": f"{BASE_URL}/TabelHarga/{page}"}
+
+        label = f"{req.endpoint} {req.key} {req.start:%Y-%m-%d}..{req.end:%Y-%m-%d} (market {req.market_type_id})"
+        started = time.time()
+        try:
+            resp = self.session.get(url, params=params, headers=headers, timeout=60)
+            elapsed = time.time() - started
+            if resp.status_code != 200:
+                logger.warning(f"{label}: HTTP {resp.status_code}")
+                return None, len(resp.content), elapsed
+            return resp.json().get("data", []) or [], len(resp.content), elapsed
+        except requests.RequestException as e:
+            logger.error(f"{label} request failed: {e}")
+            time.sleep(2)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.error(f"{label} parse error: {e}")
+        return None, 0, time.time() - started
+
+    def _parse(self, req, rows):
+        if not rows:
+            return []
+        market_type = MARKET_TYPES.get(req.market_type_id, "traditional")
+        if req.endpoint == GRID_DATA1:
+            return self._parse_grid_data1(rows, req.start, market_type)
+        return self._parse_table(req, rows, market_type)
+
+    def _record(self, commodity_id, province_id, price, market_type, date_str):
+        return {
+            "commodity_id": commodity_id,
+            "province_id": province_id,
+            "price": price,
+            "market_type": market_type,
+            "date": date_str,
+            "source": "bi",
+        }
+
+    def _parse_grid_data1(self, rows, target_date, market_type):
+        records = []
+        for row in rows:
+            prov_id_bi = row.get("ProvID")
+            commodity_name = row.get("Komoditas", "").strip()
+            price_value = row.get("Nilai")
+
+            if not prov_id_bi or not commodity_name or price_value is None:
+                continue
+
+            bps_code = BI_TO_BPS_PROVINCE.get(prov_id_bi)
+            if not bps_code:
+                logger.debug(f"Unknown BI province ID: {prov_id_bi}")
+                continue
+
+            slug = COMMODITY_SLUG_MAP.get(commodity_name)
+            commodity_id = self.commodity_id_cache.get(slug) if slug else None
+            if not commodity_id:
+                logger.debug(f"Unknown commodity: {commodity_name}")
+                continue
+
+            if price_value <= 0:
+                continue
+
+            records.append(self._record(
+                commodity_id, bps_code, float(price_value), market_type,
+                target_date.strftime("%Y-%m-%d"),
+            ))
+        return records
+
+    def _parse_table(self, req, rows, market_type):
+        """
+        Parse GetGridDataDaerah (rows are commodities of one province) or
+        GetGridDataKomoditas (rows are provinces of one commodity). Date
+        columns are keyed "dd/mm/yyyy" in both.
+        """
+        if req.endpoint == DAERAH:
+            province_id = BI_TO_BPS_PROVINCE.get(req.key)
+        else:
+            slug = next((s for s, com in KOMODITAS_IDS.items() if com == req.key), None)
+            commodity_id = self.commodity_id_cache.get(slug)
+            if not commodity_id:
+                return []
+
+        records = []
+        for row in rows:
+            name = row.get("name", "").strip()
+            level = row.get("level", 0)
+            if not name:
+                continue
+
+            if req.endpoint == DAERAH:
+                # Skip category headers (level 1) — only leaf commodities (level 2)
+                if level == 1:
+                    continue
+                slug = COMMODITY_SLUG_MAP.get(name)
+                commodity_id = self.commodity_id_cache.get(slug) if slug else None
+                if not commodity_id:
+                    continue
+            else:
+                # Skip the national row (level 0) and city/market rows (level > 1)
+                if level != 1:
+                    continue
+                province_id = PROVINCE_NAME_TO_BPS.get(name)
+                if not province_id:
+                    logger.debug(f"Unknown province: {name}")
+                    continue
+
+            for key, value in row.items():
+                try:
+                    day = datetime.strptime(str(key), "%d/%m/%Y")
+                except ValueError:
+                    continue
+
+                # The commodity table formats thousands with "." ("44.750")
+                if req.endpoint == KOMODITAS and isinstance(value, str):
+                    value = value.replace(".", "")
+                price = parse_price(value)
+                if price is None or price <= 0:
+                    continue
+
+                records.append(self._record(
+                    commodity_id, province_id, price, market_type, day.strftime("%Y-%m-%d"),
+                ))
+        return records
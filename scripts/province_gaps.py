@@ -0,0 +1,159 @@
+"""
+All-pairs province price gaps for the Bandingkan (compare) page.
+
+For one market, the last 30 days of prices are laid out as a
+(commodity, day, province) array. Broadcasting the province axis against
+itself gives every pair at once:
+
+- diff[c, i, j]: latest price of province i minus that of province j
+- pct_gap[c, i, j]: diff as a percentage of province j's latest price
+- avg_gap_30[c, i, j]: mean daily difference over the days both reported
+
+One province_gaps row per (market, commodity) holds the matrices flattened
+row-major over province_order, so comparing two provinces is a lookup at
+index i * len(province_order) + j instead of a query over `prices`.
+"""
+
+import math
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from coverage import PROVINCE_ORDER
+from db_utils import fetch_all, upsert_batches
+from rolling_stats import to_date
+
+logger = logging.getLogger(__name__)
+
+GAP_WINDOW = 30
+
+# A province's latest price counts only if reported within this many days
+# of the newest date; older prices would compare different weeks
+STALE_DAYS = 7
+
+GAPS_CONFLICT = "market_type,commodity_id"
+
+
+def price_cube(rows, commodity_order, days, province_order=PROVINCE_ORDER):
+    """
+    (commodity, day, province) float array of prices, averaged across
+    sources, NaN where nothing was reported.
+    """
+    c_index = {c: i for i, c in enumerate(commodity_order)}
+    d_index = {d: i for i, d in enumerate(days)}
+    p_index = {p: i for i, p in enumerate(province_order)}
+
+    index, prices = [], []
+    for r in rows:
+        c = c_index.get(r["commodity_id"])
+        d = d_index.get(to_date(r["date"]))
+        p = p_index.get(r["province_id"])
+        if c is None or d is None or p is None:
+            continue
+        index.append((c, d, p))
+        prices.append(float(r["price"]))
+
+    shape = (len(commodity_order), len(days), len(province_order))
+    sums = np.zeros(shape)
+    counts = np.zeros(shape)
+    if index:
+        index = tuple(np.array(index).T)
+        np.add.at(sums, index, prices)
+        np.add.at(counts, index, 1)
+    with np.errstate(invalid="ignore"):
+        return sums / counts
+
+
+def latest_prices(cube, stale_days=STALE_DAYS):
+    """
+    Last reported price per (commodity, province), NaN when the series has
+    nothing in the final `stale_days` days of the cube.
+    """
+    n_days = cube.shape[1]
+    day_numbers = np.arange(n_days)[None, :, None]
+    last = np.where(np.isnan(cube), -1, day_numbers).max(axis=1)
+    latest = np.take_along_axis(cube, np.clip(last, 0, None)[:, None, :], axis=1)[:, 0, :]
+    latest[last < n_days - stale_days] = np.nan
+    return latest
+
+
+def gap_matrices(cube, stale_days=STALE_DAYS):
+    """
+    Gap matrices for every province pair of every commodity.
+
+    Returns:
+        (latest, diff, pct_gap, avg_gap) with shapes (C, P) and (C, P, P)
+    """
+    latest = latest_prices(cube, stale_days)
+    diff = latest[:, :, None] - latest[:, None, :]
+
+    daily = cube[:, :, :, None] - cube[:, :, None, :]  # (C, D, P, P)
+    both = ~np.isnan(daily)
+    total = np.where(both, daily, 0.0).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct_gap = diff / latest[:, None, :] * 100
+        avg_gap = total / both.sum(axis=1)
+    return latest, diff, pct_gap, avg_gap
+
+
+def _to_list(values):
+    """Flattened values rounded for storage, NaN and inf as None."""
+    return [round(v, 2) if math.isfinite(v) else None for v in np.ravel(values).tolist()]
+
+
+class ProvinceGapUpdater:
+    """Recomputes province_gaps for the markets a run has written to."""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def update(self, market_types):
+        """Returns the number of province_gaps rows written."""
+        return sum(self._update_market(market_type) for market_type in sorted(set(market_types)))
+
+    def _update_market(self, market_type):
+        as_of = self._latest_date(market_type)
+        if as_of is None:
+            return 0
+        days = [as_of - timedelta(days=GAP_WINDOW - 1 - i) for i in range(GAP_WINDOW)]
+        rows = fetch_all(lambda: (
+            self.supabase.table("prices")
+            .select("commodity_id, province_id, date, price")
+            .eq("market_type", market_type)
+            .gte("date", days[0].strftime("%Y-%m-%d"))
+            .lte("date", as_of.strftime("%Y-%m-%d"))
+            .order("id")
+        ))
+        commodity_order = sorted({r["commodity_id"] for r in rows})
+        latest, diff, pct_gap, avg_gap = gap_matrices(price_cube(rows, commodity_order, days))
+
+        now = datetime.utcnow().isoformat()
+        records = [
+            {
+                "market_type": market_type,
+                "commodity_id": commodity_id,
+                "date": as_of.strftime("%Y-%m-%d"),
+                "province_order": PROVINCE_ORDER,
+                "latest_prices": _to_list(latest[c]),
+                "diff": _to_list(diff[c]),
+                "pct_gap": _to_list(pct_gap[c]),
+                "avg_gap_30": _to_list(avg_gap[c]),
+                "updated_at": now,
+            }
+            for c, commodity_id in enumerate(commodity_order)
+        ]
+        written = upsert_batches(self.supabase, "province_gaps", records, GAPS_CONFLICT)
+        logger.info(f"province_gaps ({market_type}): {written} commodities as of {as_of}")
+        return written
+
+    def _latest_date(self, market_type):
+        result = (
+            self.supabase.table("prices")
+            .select("date")
+            .eq("market_type", market_type)
+            .order("date", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return to_date(result.data[0]["date"]) if result.data else None
@@ -0,0 +1,353 @@
+"""
+Revision audit: detect retroactive BI PIHPS price revisions without a full
+backfill.
+
+History is split into fixed 7-day chunks (Monday to Sunday) per province and
+market. For each chunk we store a compact hash of the normalized
+GetGridDataDaerah response. An audit run re-fetches chunks newest first,
+skipping those checked recently, and only when a hash differs parses the
+chunk, compares it with the stored prices, upserts the changed values and
+records every revision with its old and new price.
+
+Older chunks are rechecked less often than recent ones. Chunks are checked
+in order of how overdue they are relative to their interval, and never-
+checked chunks come first. Every chunk therefore keeps coming due, and the
+whole window is covered within a bounded number of runs even when the
+budget cannot keep every interval.
+
+Usage: python scripts/revisions.py [--days 365] [--budget 300] [--recheck-days 7]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from bi_reference import BI_TO_BPS_PROVINCE, MARKET_TYPES, parse_price
+from coverage import CoverageTracker
+from db_utils import fetch_all, upsert_batches
+from planner import DAERAH, REQUEST_DELAY, PlannedRequest
+from province_gaps import ProvinceGapUpdater
+from rolling_stats import PriceStatsUpdater
+from sources.base import SourceContext
+from sources.bi_pihps import BIPIHPSSource
+from writer import BatchWriter
+
+load_dotenv()
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+CHUNK_DAYS = 7
+SOURCE = "bi"
+
+# A chunk is due again after recheck_days * (1 + age / AGE_STEP_DAYS): the
+# newest weeks every recheck_days, a year-old week about every 14x that.
+AGE_STEP_DAYS = 28
+
+# How often revision-audit.yml runs the audit
+RUN_INTERVAL_DAYS = 7
+FINGERPRINT_CONFLICT = "source,province_id,market_type,chunk_start"
+PRICES_CONFLICT = "commodity_id,province_id,date,market_type,source"
+
+
+def chunk_start(day):
+    """Monday of the week containing `day`; chunk boundaries never move."""
+    return day - timedelta(days=day.weekday())
+
+
+def fingerprint(rows):
+    """
+    Hash of a GetGridDataDaerah response reduced to (commodity, date, price)
+    triples, so row order, numbering and formatting changes do not count.
+    """
+    cells = []
+    for row in rows or []:
+        name = str(row.get("name", "")).strip()
+        if not name or row.get("level") == 1:
+            continue
+        for key, value in row.items():
+            if str(key).count("/") != 2:
+                continue
+            price = parse_price(value)
+            if price is not None and price > 0:
+                cells.append((name, str(key), price))
+    cells.sort()
+    payload = json.dumps(cells, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class RevisionAuditor:
+    """Re-checks historical chunks and applies only the ones BI has changed."""
+
+    def __init__(self, days=365, budget=300, recheck_days=7):
+        self.days = days
+        self.budget = budget
+        self.recheck_days = recheck_days
+
+        url = os.environ.get("SUPABASE_URL")
+        key = os.environ.get("SUPABASE_KEY")
+        if not url or not key:
+            logger.error("SUPABASE_URL and SUPABASE_KEY required")
+            sys.exit(1)
+        self.supabase = create_client(url, key)
+        self.source = BIPIHPSSource()
+
+    def _load_commodity_ids(self):
+        result = self.supabase.table("commodities").select("id, slug").execute()
+        return {row["slug"]: row["id"] for row in result.data}
+
+    def _load_fingerprints(self, since):
+        rows = fetch_all(lambda: (
+            self.supabase.table("upstream_fingerprints")
+            .select("province_id, market_type, chunk_start, hash, checked_at, changed_at")
+            .eq("source", SOURCE)
+            .gte("chunk_start", since.strftime("%Y-%m-%d"))
+            .order("chunk_start")
+            .order("province_id")
+            .order("market_type")
+        ))
+        return {(r["province_id"], r["market_type"], r["chunk_start"]): r for r in rows}
+
+    def recheck_interval(self, age_days):
+        """Days before a chunk `age_days` old is due to be checked again."""
+        return self.recheck_days * (1 + age_days / AGE_STEP_DAYS)
+
+    def _chunk_starts(self, today):
+        """Start of every full chunk in the audit window, newest first."""
+        oldest = chunk_start(today - timedelta(days=self.days))
+        start = chunk_start(today) - timedelta(days=CHUNK_DAYS)  # last full week
+        starts = []
+        while start >= oldest:
+            starts.append(start)
+            start -= timedelta(days=CHUNK_DAYS)
+        return starts
+
+    def _due_chunks(self, today, fingerprints):
+        """
+        (BI province id, market type id, chunk start) of every chunk past
+        its recheck interval, most overdue first; never-checked chunks lead,
+        newest first.
+        """
+        now = datetime.utcnow()
+        scored = []
+        for start in self._chunk_starts(today):
+            interval = self.recheck_interval((today - start).days)
+            for market_type_id, market_type in MARKET_TYPES.items():
+                for bi_id, bps_code in BI_TO_BPS_PROVINCE.items():
+                    fp = fingerprints.get((bps_code, market_type, start.strftime("%Y-%m-%d")))
+                    if fp is None:
+                        overdue = float("inf")
+                    else:
+                        checked = datetime.fromisoformat(fp["checked_at"][:19])
+                        overdue = (now - checked).total_seconds() / 86400 / interval
+                    if overdue >= 1:
+                        scored.append((overdue, start, bi_id, market_type_id))
+        scored.sort(key=lambda c: (-c[0], -c[1].toordinal()))
+        return [(bi_id, market_type_id, start) for _, start, bi_id, market_type_id in scored]
+
+    def _log_schedule(self, today):
+        """How often the oldest chunks get rechecked at this budget, once caught up."""
+        starts = self._chunk_starts(today)
+        if not starts:
+            return
+        per_chunk = len(MARKET_TYPES) * len(BI_TO_BPS_PROVINCE)
+        needed = sum(
+            per_chunk * RUN_INTERVAL_DAYS / max(self.recheck_interval((today - s).days), RUN_INTERVAL_DAYS)
+            for s in starts
+        )
+        stretch = max(1.0, needed / self.budget)
+        oldest = self.recheck_interval((today - starts[-1]).days) * stretch
+        logger.info(
+            f"{len(starts) * per_chunk} chunks in window; keeping every interval needs "
+            f"~{needed:.0f} checks per run. At budget {self.budget} the oldest chunks are "
+            f"rechecked about every {oldest:.0f} days, the newest every "
+            f"{max(self.recheck_days * stretch, RUN_INTERVAL_DAYS):.0f}"
+        )
+
+    def _stored_prices(self, province_id, market_type, start, end):
+        rows = fetch_all(lambda: (
+            self.supabase.table("prices")
+            .select("commodity_id, date, price")
+            .eq("province_id", province_id)
+            .eq("market_type", market_type)
+            .eq("source", SOURCE)
+            .gte("date", start.strftime("%Y-%m-%d"))
+            .lte("date", end.strftime("%Y-%m-%d"))
+            .order("id")
+        ))
+        return {(r["commodity_id"], r["date"]): float(r["price"]) for r in rows}
+
+    @staticmethod
+    def _record_key(rec):
+        return (rec["commodity_id"], rec["province_id"], rec["market_type"], rec["date"])
+
+    @staticmethod
+    def _chunk_key(rec):
+        week = chunk_start(datetime.strptime(rec["date"], "%Y-%m-%d").date())
+        return (rec["province_id"], rec["market_type"], week.strftime("%Y-%m-%d"))
+
+    def _diff(self, records, stored, detected_at):
+        """Records whose value is new or changed, and the revisions among them."""
+        changed, revisions = [], []
+        for rec in records:
+            old = stored.get((rec["commodity_id"], rec["date"]))
+            if old is not None and abs(old - rec["price"]) < 0.005:
+                continue
+            changed.append(rec)
+            if old is not None:
+                revisions.append({
+                    "commodity_id": rec["commodity_id"],
+                    "province_id": rec["province_id"],
+                    "market_type": rec["market_type"],
+                    "date": rec["date"],
+                    "source": SOURCE,
+                    "old_price": old,
+                    "new_price": rec["price"],
+                    "detected_at": detected_at,
+                })
+        return changed, revisions
+
+    def run(self):
+        start_time = time.time()
+        today = datetime.now().date()
+
+        logger.info("=" * 60)
+        logger.info(f"BI PIHPS Revision Audit ({self.days} days, budget {self.budget} requests)")
+        logger.info("=" * 60)
+
+        commodity_ids = self._load_commodity_ids()
+        if not self.source.setup(SourceContext(today, commodity_ids, self.supabase)):
+            logger.error("Aborting: session initialization failed")
+            return
+        executor = self.source.executor
+
+        fingerprints = self._load_fingerprints(chunk_start(today - timedelta(days=self.days)))
+        self._log_schedule(today)
+        due = self._due_chunks(today, fingerprints)
+        logger.info(f"{len(due)} chunks due, checking up to {self.budget}")
+
+        checked, unchanged, failed = 0, 0, 0
+        new_fingerprints, all_changed, all_revisions = [], [], []
+
+        for bi_id, market_type_id, start in due[:self.budget]:
+            if checked:
+                time.sleep(REQUEST_DELAY)  # Be respectful
+            checked += 1
+
+            end = start + timedelta(days=CHUNK_DAYS - 1)
+            province_id = BI_TO_BPS_PROVINCE[bi_id]
+            market_type = MARKET_TYPES[market_type_id]
+            req = PlannedRequest(DAERAH, market_type_id, start, end, bi_id)
+
+            rows = executor.fetch(req)
+            if rows is None:
+                failed += 1
+                continue
+
+            now = datetime.utcnow().isoformat()
+            digest = fingerprint(rows)
+            key = (province_id, market_type, start.strftime("%Y-%m-%d"))
+            previous = fingerprints.get(key)
+            entry = {
+                "source": SOURCE,
+                "province_id": province_id,
+                "market_type": market_type,
+                "chunk_start": key[2],
+                "chunk_end": end.strftime("%Y-%m-%d"),
+                "hash": digest,
+                "checked_at": now,
+                "changed_at": previous.get("changed_at") if previous else now,
+            }
+
+            if previous and previous["hash"] == digest:
+                unchanged += 1
+                new_fingerprints.append(entry)
+                continue
+
+            records = executor.parse(req, rows)
+            stored = self._stored_prices(province_id, market_type, start, end)
+            changed, revisions = self._diff(records, stored, now)
+            if changed:
+                entry["changed_at"] = now
+                logger.info(
+                    f"Province {bi_id} ({province_id}) | {start:%m/%d} - {end:%m/%d} | {market_type} "
+                    f"-> {len(changed)} changed, {len(revisions)} revised"
+                )
+            all_changed.extend(changed)
+            all_revisions.extend(revisions)
+            new_fingerprints.append(entry)
+
+        # Prices first: a fingerprint must not claim a chunk whose rows were not written
+        result = BatchWriter(self.supabase, "prices", PRICES_CONFLICT).write(all_changed)
+        written = len(result.written)
+        if result.failed:
+            failed_chunks = {self._chunk_key(r) for r in result.failed}
+            logger.error(
+                f"{len(result.failed)} changed prices failed to upsert; keeping the old "
+                f"fingerprints of {len(failed_chunks)} chunks so they are retried"
+            )
+            new_fingerprints = [
+                f for f in new_fingerprints
+                if (f["province_id"], f["market_type"], f["chunk_start"]) not in failed_chunks
+            ]
+        if result.quarantined:
+            # Their chunks keep the new fingerprint: rechecking cannot fix a
+            # rejected row, it waits in write_quarantine for a manual fix
+            logger.warning(f"{len(result.quarantined)} changed prices quarantined; no revision recorded for them")
+
+        written_keys = {self._record_key(r) for r in result.written}
+        all_revisions = [r for r in all_revisions if self._record_key(r) in written_keys]
+        for i in range(0, len(all_revisions), 500):
+            try:
+                self.supabase.table("price_revisions").insert(all_revisions[i:i + 500]).execute()
+            except Exception as e:
+                logger.error(f"Failed to record revisions: {e}")
+        upsert_batches(self.supabase, "upstream_fingerprints", new_fingerprints, FINGERPRINT_CONFLICT)
+
+        if written:
+            try:
+                PriceStatsUpdater(self.supabase).update(result.written)
+            except Exception as e:
+                logger.error(f"Price stats update failed: {e}")
+            try:
+                CoverageTracker(self.supabase, commodity_ids.values()).update(result.written)
+            except Exception as e:
+                logger.error(f"Coverage summary update failed: {e}")
+            try:
+                ProvinceGapUpdater(self.supabase).update(rec["market_type"] for rec in result.written)
+            except Exception as e:
+                logger.error(f"Province gap update failed: {e}")
+
+        self.source.teardown()
+
+        duration = time.time() - start_time
+        logger.info(f"\n{'=' * 60}")
+        logger.info(f"Revision audit complete!")
+        logger.info(f"Chunks checked: {checked} ({unchanged} unchanged, {failed} failed)")
+        logger.info(f"Prices written: {written}")
+        logger.info(f"Revisions recorded: {len(all_revisions)}")
+        logger.info(f"Duration: {duration:.1f}s ({duration / 60:.1f} min)")
+        logger.info(f"{'=' * 60}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect and apply retroactive BI price revisions")
+    parser.add_argument("--days", type=int, default=365, help="How far back to audit (default: 365)")
+    parser.add_argument("--budget", type=int, default=300, help="Max upstream requests per run (default: 300)")
+    parser.add_argument("--recheck-days", type=int, default=7, help="Recheck interval of the newest chunks; older ones wait longer (default: 7)")
+    args = parser.parse_args()
+
+    auditor = RevisionAuditor(days=args.days, budget=args.budget, recheck_days=args.recheck_days)
+    auditor.run()
@@ -0,0 +1,480 @@
+"""
+Rolling price statistics: 7/30/90-day moving averages, rolling standard
+deviation, and week/month/year-over-year change.
+
+Stats live in the price_stats table, one row per (commodity, province,
+market, date). Each row also stores the running count/sum/sum-of-squares of
+its windows, so the next day is derived from the previous row by adding the
+new price and subtracting only the prices that slid out of each window —
+the cost of a daily update does not grow with the length of the history.
+
+National series use province_id "00" (the BPS code for Indonesia) and are
+built from the mean province price of each day, like national_averages.
+"""
+
+import math
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from db_utils import fetch_all, upsert_batches
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = (7, 30, 90)
+
+# Change columns and how many days back their reference price is
+CHANGE_LAGS = (
+    ("change_wow", 7),
+    ("change_mom", 30),
+    ("change_yoy", 365),
+)
+
+# BI skips weekends and holidays, so a reference date without a price falls
+# back to the nearest earlier observation within this many days
+ANCHOR_TOLERANCE = 6
+
+# How far before the first touched date to look for a previous stats row
+SEED_LOOKBACK = 7
+
+NATIONAL_PROVINCE_ID = "00"
+
+STATS_CONFLICT = "commodity_id,province_id,market_type,date"
+
+
+def to_date(value):
+    """Parse a 'YYYY-MM-DD' string (or pass through a date/datetime) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class WindowState:
+    """Running count, sum and sum of squares over a trailing calendar window."""
+
+    __slots__ = ("days", "n", "total", "total_sq")
+
+    def __init__(self, days, n=0, total=0.0, total_sq=0.0):
+        self.days = days
+        self.n = n
+        self.total = total
+        self.total_sq = total_sq
+
+    def add(self, x):
+        self.n += 1
+        self.total += x
+        self.total_sq += x * x
+
+    def remove(self, x):
+        self.n -= 1
+        if self.n <= 0:
+            self.reset()
+            return
+        self.total -= x
+        self.total_sq -= x * x
+
+    def reset(self):
+        self.n = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def std(self):
+        """Sample standard deviation, or None with fewer than two prices."""
+        if self.n < 2:
+            return None
+        variance = (self.total_sq - self.total * self.total / self.n) / (self.n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class SeriesState:
+    """Window state of one series as of its last processed date."""
+
+    __slots__ = ("last_date", "origin", "windows")
+
+    def __init__(self, last_date=None, windows=None):
+        self.last_date = last_date
+        # First date pushed into a fresh state; earlier prices were never
+        # added, so they must not be evicted either. None for seeded states.
+        self.origin = None
+        self.windows = windows or [WindowState(w) for w in WINDOWS]
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild the state stored in a price_stats row."""
+        windows = [
+            WindowState(w, row[f"n_{w}"] or 0, row[f"sum_{w}"] or 0.0, row[f"sumsq_{w}"] or 0.0)
+            for w in WINDOWS
+        ]
+        return cls(to_date(row["date"]), windows)
+
+    def advance(self, day, price, history):
+        """
+        Slide every window forward to `day` and add its price.
+
+        Only the dates in (last_date - w, day - w] leave a window, so each
+        step touches at most as many days as have passed since the last one.
+        """
+        if self.last_date is None:
+            self.origin = day
+        for window in self.windows:
+            if self.last_date is not None:
+                gap = (day - self.last_date).days
+                if gap >= window.days:
+                    window.reset()
+                else:
+                    leaving = self.last_date - timedelta(days=window.days - 1)
+                    for offset in range(gap):
+                        d = leaving + timedelta(days=offset)
+                        if self.origin is not None and d < self.origin:
+                            continue
+                        x = history.get(d)
+                        if x is not None:
+                            window.remove(x)
+            window.add(price)
+        self.last_date = day
+
+
+def _anchor_price(history, target):
+    """Price on `target`, or on the nearest earlier date within tolerance."""
+    for offset in range(ANCHOR_TOLERANCE + 1):
+        price = history.get(target - timedelta(days=offset))
+        if price is not None:
+            return price
+    return None
+
+
+def _changes(day, price, history):
+    """Change columns of `price` on `day` against its reference prices."""
+    changes = {}
+    for column, lag in CHANGE_LAGS:
+        anchor = _anchor_price(history, day - timedelta(days=lag))
+        changes[column] = round((price - anchor) / anchor * 100, 2) if anchor else None
+    return changes
+
+
+def _stats_row(key, day, price, state, history):
+    commodity_id, province_id = key
+    row = {
+        "commodity_id": commodity_id,
+        "province_id": province_id,
+        "date": day.strftime("%Y-%m-%d"),
+        "price": round(price, 2),
+    }
+    for window in state.windows:
+        w = window.days
+        mean = window.mean()
+        std = window.std()
+        row[f"n_{w}"] = window.n
+        row[f"sum_{w}"] = window.total
+        row[f"sumsq_{w}"] = window.total_sq
+        row[f"ma_{w}"] = round(mean, 2) if mean is not None else None
+        row[f"std_{w}"] = round(std, 2) if std is not None else None
+    row.update(_changes(day, price, history))
+    return row
+
+
+def compute_stats(history, seeds, start, end):
+    """
+    Stream each series forward and return the stats rows it produces.
+
+    Args:
+        history: {(commodity_id, province_id): {date: price}} covering at
+            least required_ranges(...) for these series
+        seeds: {(commodity_id, province_id): SeriesState} from the latest
+            stats row before `start`; series without a seed are primed from
+            the prices of the widest window before `start`
+        start, end: first and last date to produce stats for
+
+    Returns:
+        list of stats rows (without market_type)
+    """
+    rows = []
+    prime_start = start - timedelta(days=max(WINDOWS) - 1)
+
+    for key, prices in history.items():
+        seed = seeds.get(key)
+        if seed is not None:
+            state = SeriesState(seed.last_date, [
+                WindowState(w.days, w.n, w.total, w.total_sq) for w in seed.windows
+            ])
+            first = seed.last_date + timedelta(days=1)
+        else:
+            state = SeriesState()
+            first = prime_start
+
+        for day in sorted(d for d in prices if first <= d <= end):
+            price = prices[day]
+            state.advance(day, price, prices)
+            if seed is not None or day >= start:
+                rows.append(_stats_row(key, day, price, state, prices))
+
+    return rows
+
+
+def required_ranges(start, end, seed_dates, has_unseeded):
+    """
+    Date ranges of prices needed to update [start, end].
+
+    Seeded series need the new prices, the prices leaving each window and
+    the change reference prices — a handful of days regardless of how long
+    the history is. Unseeded series additionally need the widest window
+    before `start`.
+    """
+    ranges = [(start - timedelta(days=lag + ANCHOR_TOLERANCE), end - timedelta(days=lag))
+              for _, lag in CHANGE_LAGS]
+    if seed_dates:
+        earliest = min(seed_dates)
+        ranges.append((earliest + timedelta(days=1), end))
+        for w in WINDOWS:
+            ranges.append((earliest - timedelta(days=w - 1), end - timedelta(days=w)))
+    if has_unseeded or not seed_dates:
+        ranges.append((start - timedelta(days=max(WINDOWS) - 1), end))
+    return merge_ranges(ranges)
+
+
+def anchor_ranges(dates):
+    """Date ranges holding the change reference prices of `dates`."""
+    return merge_ranges(
+        (day - timedelta(days=lag + ANCHOR_TOLERANCE), day - timedelta(days=lag))
+        for day in dates for _, lag in CHANGE_LAGS
+    )
+
+
+def merge_ranges(ranges):
+    """Sort (lo, hi) date ranges and merge the ones that overlap or touch."""
+    merged = []
+    for lo, hi in sorted(r for r in ranges if r[0] <= r[1]):
+        if merged and lo <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+
+def touched_runs(touched, gap=max(WINDOWS)):
+    """
+    Split touched dates into runs to recompute one at a time.
+
+    Dates at most `gap` days apart share a run: each run is recomputed
+    through the widest window after its last date anyway, so splitting them
+    would only recompute the dates between them twice.
+
+    Args:
+        touched: {date: set of series keys written on that date}
+
+    Returns:
+        list of (start, end, series keys) in date order
+    """
+    runs = []
+    for day in sorted(touched):
+        if runs and (day - runs[-1][1]).days <= gap:
+            start, _, keys = runs[-1]
+            runs[-1] = (start, day, keys | touched[day])
+        else:
+            runs.append((day, day, set(touched[day])))
+    return runs
+
+
+def shifted_dates(touched, covered, latest):
+    """
+    Rows whose change reference price may be one of the touched prices but
+    that lie outside the recomputed runs — mostly change_yoy a year after a
+    revised date.
+
+    Args:
+        touched: {date: set of series keys written on that date}
+        covered: [(start, end, series keys)] already recomputed
+        latest: newest date in `prices`; no stats exist after it
+
+    Returns:
+        {date: set of series keys}
+    """
+    shifted = defaultdict(set)
+    for day, keys in touched.items():
+        for _, lag in CHANGE_LAGS:
+            for offset in range(ANCHOR_TOLERANCE + 1):
+                target = day + timedelta(days=lag + offset)
+                if target > latest:
+                    break
+                shifted[target] |= {
+                    key for key in keys
+                    if not any(start <= target <= end and key in run for start, end, run in covered)
+                }
+    return {day: keys for day, keys in shifted.items() if keys}
+
+
+def add_national_series(history, commodity_ids):
+    """Add a mean-across-provinces series for each commodity to `history`."""
+    for commodity_id in commodity_ids:
+        totals = defaultdict(lambda: [0.0, 0])
+        for (c_id, province_id), prices in history.items():
+            if c_id != commodity_id or province_id == NATIONAL_PROVINCE_ID:
+                continue
+            for day, price in prices.items():
+                totals[day][0] += price
+                totals[day][1] += 1
+        if totals:
+            history[(commodity_id, NATIONAL_PROVINCE_ID)] = {
+                day: total / count for day, (total, count) in totals.items()
+            }
+
+
+class PriceStatsUpdater:
+    """Keeps price_stats current for the dates a scrape has just written."""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def update(self, records):
+        """
+        Refresh stats for the series and dates touched by `records`.
+
+        Args:
+            records: price records as upserted into `prices`
+
+        Returns:
+            number of stats rows written
+        """
+        touched = defaultdict(lambda: defaultdict(set))
+        for rec in records:
+            key = (rec["commodity_id"], rec["province_id"])
+            touched[rec["market_type"]][to_date(rec["date"])].update({key, (key[0], NATIONAL_PROVINCE_ID)})
+
+        total = 0
+        for market_type, by_date in touched.items():
+            latest = self._latest_date(market_type) or max(by_date)
+            covered = []
+            for start, end, keys in touched_runs(by_date):
+                # Also refresh later dates inside the widest window when older
+                # dates were rewritten (backfills, revisions). A daily scrape
+                # ends at the latest date, so nothing is added.
+                end = max(end, min(latest, end + timedelta(days=max(WINDOWS) - 1)))
+                total += self._update_market(market_type, keys, start, end)
+                covered.append((start, end, keys))
+            total += self._refresh_changes(market_type, shifted_dates(by_date, covered, latest))
+        return total
+
+    def _update_market(self, market_type, keys, start, end):
+        commodity_ids = {c_id for c_id, _ in keys}
+
+        seeds = {k: s for k, s in self._load_seeds(market_type, start).items() if k in keys}
+        ranges = required_ranges(
+            start, end,
+            {s.last_date for s in seeds.values()},
+            has_unseeded=len(seeds) < len(keys),
+        )
+
+        history = self._load_prices(market_type, ranges)
+        add_national_series(history, commodity_ids)
+        history = {k: v for k, v in history.items() if k in keys}
+
+        rows = compute_stats(history, seeds, start, end)
+        for row in rows:
+            row["market_type"] = market_type
+
+        written = upsert_batches(self.supabase, "price_stats", rows, STATS_CONFLICT)
+        logger.info(
+            f"price_stats ({market_type}): {written} rows for "
+            f"{start} - {end}, {len(seeds)}/{len(keys)} series seeded"
+        )
+        return written
+
+    def _refresh_changes(self, market_type, shifted):
+        """
+        Recompute only the change columns of the stored rows in `shifted`
+        ({date: series keys}); their windows do not depend on the rewritten
+        prices.
+        """
+        if not shifted:
+            return 0
+        dates = sorted(shifted)
+        stored = fetch_all(lambda: (
+            self.supabase.table("price_stats")
+            .select("commodity_id, province_id, date, price")
+            .eq("market_type", market_type)
+            .in_("date", [d.strftime("%Y-%m-%d") for d in dates])
+            .order("date")
+            .order("commodity_id")
+            .order("province_id")
+        ))
+        stored = [
+            row for row in stored
+            if (row["commodity_id"], row["province_id"]) in shifted[to_date(row["date"])]
+        ]
+        if not stored:
+            return 0
+
+        history = self._load_prices(market_type, anchor_ranges(dates))
+        add_national_series(history, {row["commodity_id"] for row in stored})
+
+        rows = []
+        for row in stored:
+            key = (row["commodity_id"], row["province_id"])
+            day = to_date(row["date"])
+            rows.append({
+                "commodity_id": row["commodity_id"],
+                "province_id": row["province_id"],
+                "market_type": market_type,
+                "date": row["date"],
+                "price": row["price"],  # NOT NULL; unchanged
+                **_changes(day, float(row["price"]), history.get(key, {})),
+            })
+
+        written = upsert_batches(self.supabase, "price_stats", rows, STATS_CONFLICT)
+        logger.info(f"price_stats ({market_type}): change columns refreshed on {written} later rows")
+        return written
+
+    def _latest_date(self, market_type):
+        result = (
+            self.supabase.table("prices")
+            .select("date")
+            .eq("market_type", market_type)
+            .order("date", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return to_date(result.data[0]["date"]) if result.data else None
+
+    def _load_seeds(self, market_type, start):
+        """Latest stats row per series in the few days before `start`."""
+        rows = fetch_all(lambda: (
+            self.supabase.table("price_stats")
+            .select("*")
+            .eq("market_type", market_type)
+            .gte("date", (start - timedelta(days=SEED_LOOKBACK)).strftime("%Y-%m-%d"))
+            .lt("date", start.strftime("%Y-%m-%d"))
+            .order("date")
+            .order("commodity_id")
+            .order("province_id")
+        ))
+        seeds = {}
+        for row in rows:
+            seeds[(row["commodity_id"], row["province_id"])] = SeriesState.from_row(row)
+        return seeds
+
+    def _load_prices(self, market_type, ranges):
+        """Province prices for the given date ranges, averaged across sources."""
+        sums = defaultdict(lambda: [0.0, 0])
+        for lo, hi in ranges:
+            rows = fetch_all(lambda: (
+                self.supabase.table("prices")
+                .select("commodity_id, province_id, date, price")
+                .eq("market_type", market_type)
+                .gte("date", lo.strftime("%Y-%m-%d"))
+                .lte("date", hi.strftime("%Y-%m-%d"))
+                .order("id")
+            ))
+            for row in rows:
+                entry = sums[(row["commodity_id"], row["province_id"], to_date(row["date"]))]
+                entry[0] += float(row["price"])
+                entry[1] += 1
+
+        history = defaultdict(dict)
+        for (commodity_id, province_id, day), (total, count) in sums.items():
+            history[(commodity_id, province_id)][day] = total / count
+        return history
@@ -0,0 +1,28 @@
+"""
+Price source plugins. Sources register themselves with @register_source and
+are looked up by name (the value written to prices.source).
+"""
+
+SOURCES = {}
+
+
+def register_source(cls):
+    """Class decorator adding a PriceSource subclass to the registry."""
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} must define a source name")
+    SOURCES[cls.name] = cls
+    return cls
+
+
+def get_sources(names=None):
+    """Instantiate the named sources, or every source enabled by default."""
+    if names is None:
+        return [cls() for cls in SOURCES.values() if cls.enabled_by_default]
+    unknown = [n for n in names if n not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)}; available: {', '.join(SOURCES)}")
+    return [SOURCES[n]() for n in names]
+
+
+# Import plugins so they register themselves
+from sources import bi_pihps, stub  # noqa: E402,F401
@@ -0,0 +1,110 @@
+"""
+Base class and shared types for price source plugins.
+
+A source goes through four steps, driven by ingest.IngestionRunner:
+
+    setup(context)        open sessions, load reference data
+    plan(context)         yield fetch units (one unit = one upstream request)
+    fetch(unit)           perform the request, return the raw payload
+    parse(unit, payload)  turn the payload into common price records
+
+Units are fetched in the order plan() yields them, on one thread per source,
+so a generator plan may look at what earlier units returned (e.g. fall back
+to another date when the first one had no data).
+
+Every record has the shape of a `prices` row:
+    {"commodity_id", "province_id", "price", "market_type", "date", "source"}
+"""
+
+import time
+import threading
+from collections import namedtuple
+
+# What a source hands to the shared write pipeline
+RecordBatch = namedtuple("RecordBatch", "source unit records")
+
+
+class SourceContext:
+    """Run-wide inputs shared by every source."""
+
+    def __init__(self, today, commodity_ids, supabase=None):
+        self.today = today
+        self.commodity_ids = commodity_ids  # slug -> commodities.id
+        self.supabase = supabase  # None in a dry run
+
+
+class SourceHealth:
+    """Per-run health report of one source."""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.failures = 0
+        self.records = 0
+        self.error = None
+        self.skipped = False  # Nothing new upstream, so nothing was fetched
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def duration(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def summary(self):
+        return (
+            f"{self.name}: {self.requests} requests, "
+            f"{self.failures} failed, {self.records} records, {self.duration:.1f}s"
+        )
+
+
+class RateLimiter:
+    """Enforces a minimum interval between calls to wait()."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            if delay > 0:
+                time.sleep(delay)
+                now += delay
+            self._next_at = now + self.min_interval
+
+
+class PriceSource:
+    """Base class for price source plugins. Subclasses set `name` and override the steps."""
+
+    name = None  # stored in prices.source and scrape_logs.source
+    min_interval = 1.5  # seconds between upstream requests
+    enabled_by_default = True
+
+    def __init__(self):
+        self.stats = SourceHealth(self.name)
+
+    def setup(self, context):
+        """Prepare sessions and reference data. Return False to skip this source."""
+        return True
+
+    def plan(self, context):
+        """Return or yield the fetch units for this run."""
+        raise NotImplementedError
+
+    def fetch(self, unit):
+        """Perform one upstream request. Return the raw payload, or None on failure."""
+        raise NotImplementedError
+
+    def parse(self, unit, payload):
+        """Turn a payload into a list of price records."""
+        raise NotImplementedError
+
+    def teardown(self):
+        """Release resources after the run, successful or not."""
+
+    def health(self):
+        return self.stats
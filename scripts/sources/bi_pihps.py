@@ -0,0 +1,165 @@
+"""
+Bank Indonesia PIHPS source plugin.
+
+For yesterday and today (BI data typically lags by one day) and each market,
+a freshness probe first checks which provinces BI has published that we do
+not have yet; only those slices are then fetched, with the request plan
+planner.py finds cheapest. The probe's rows for new provinces are held back
+until every follow-up request of the slice has succeeded: once written they
+mark the provinces as stored, so writing them after a failed fetch would
+leave the other commodities missing for good. Without probing it falls back from yesterday to
+today per market and fetches everything for the first date with data.
+"""
+
+import time
+import logging
+from datetime import timedelta
+
+import requests
+
+from bi_reference import BASE_URL, COMMODITY_SLUGS, GRID_DATA1_CATEGORIES, MARKET_TYPES
+from freshness import PROBE_CATEGORY, evaluate_probe, probe_request
+from planner import Coverage, PlanExecutor, plan_fetch
+from sources import register_source
+from sources.base import PriceSource
+
+logger = logging.getLogger(__name__)
+
+
+@register_source
+class BIPIHPSSource(PriceSource):
+    """BI PIHPS daily prices for traditional and modern markets."""
+
+    name = "bi"
+    min_interval = 1.5  # Be respectful — 1.5s between requests
+
+    def __init__(self, market_type_ids=("1", "2"), use_probe=True):
+        super().__init__()
+        self.market_type_ids = list(market_type_ids)
+        self.use_probe = use_probe
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+            "Accept": "application/json, text/javascript, */*; q=0.01",
+            "X-Requested-With": "XMLHttpRequest",
+            "Referer": f"{BASE_URL}",
+        })
+        self.executor = None
+        self.supabase = None
+        self.commodity_ids = {}
+        self.probes = {}  # (market_type_id, date) -> freshness.ProbeResult
+        self._found = {}  # market_type_id -> records parsed for the current date
+        self._held = {}  # (market_type_id, date) -> probe records awaiting their slice
+        self._remaining = {}  # (market_type_id, date) -> follow-up requests not yet parsed
+        self._failed = set()  # (market_type_id, date) slices with a failed follow-up
+
+    def setup(self, context):
+        """Visit the homepage to obtain session cookies (WSAntiforgeryCookie)."""
+        logger.info("Initializing session by visiting BI PIHPS homepage...")
+        try:
+            resp = self.session.get(BASE_URL, timeout=60)
+            logger.info(f"Homepage status: {resp.status_code}, cookies: {list(self.session.cookies.keys())}")
+            time.sleep(1)
+        except requests.RequestException as e:
+            logger.error(f"Failed to initialize session: {e}")
+            return False
+        self.executor = PlanExecutor(self.session, context.commodity_ids)
+        self.supabase = context.supabase
+        self.commodity_ids = context.commodity_ids
+        return resp.status_code == 200
+
+    def target_dates(self, context):
+        """Dates to try, in order, for each market."""
+        return [context.today - timedelta(days=1), context.today]
+
+    def plan(self, context):
+        if self.use_probe:
+            return self._plan_probed(context)
+        return self._plan_fallback(context)
+
+    def _plan_probed(self, context):
+        # The probe already returns its category for every province
+        rest = [s for s in COMMODITY_SLUGS if s not in GRID_DATA1_CATEGORIES[PROBE_CATEGORY]]
+        for market_type_id in self.market_type_ids:
+            for day in self.target_dates(context):
+                yield probe_request(market_type_id, day), None, True
+                result = self.probes.get((market_type_id, day))
+                if result is None:
+                    continue  # Probe failed; try again next run
+                logger.info(f"Probe {result.summary()}")
+                if not result.new_provinces:
+                    continue
+
+                coverage = Coverage(
+                    [day], provinces=result.new_provinces,
+                    commodities=rest, market_type_ids=[market_type_id],
+                )
+                plan = plan_fetch(coverage, self.executor.models)
+                logger.info(f"  Plan: {plan.summary()}")
+                self._remaining[(market_type_id, day)] = len(plan.requests)
+                for req in plan.requests:
+                    yield req, coverage, False
+                if (market_type_id, day) in self._failed:
+                    held = self._held.pop((market_type_id, day), [])
+                    logger.warning(
+                        f"  Follow-up fetch failed; not storing {len(held)} probe rows "
+                        f"so these provinces are retried next run"
+                    )
+
+        self.stats.skipped = not any(r.new_provinces for r in self.probes.values())
+
+    def _plan_fallback(self, context):
+        for market_type_id in self.market_type_ids:
+            market_name = MARKET_TYPES[market_type_id].capitalize()
+            for target_date in self.target_dates(context):
+                logger.info(f"{market_name} market, target date {target_date:%Y-%m-%d}")
+                coverage = Coverage([target_date], market_type_ids=[market_type_id])
+                plan = plan_fetch(coverage, self.executor.models)
+                logger.info(f"  Plan: {plan.summary()}")
+
+                self._found[market_type_id] = 0
+                for req in plan.requests:
+                    yield req, coverage, False
+                if self._found[market_type_id]:
+                    break  # If we got data for this date, no need to try the next
+                logger.info(f"  No data for {target_date:%Y-%m-%d}, trying next date...")
+
+    def fetch(self, unit):
+        req, _, is_probe = unit
+        payload = None
+        try:
+            payload = self.executor.fetch(req)
+            return payload
+        finally:
+            if payload is None and not is_probe:
+                self._failed.add((req.market_type_id, req.start))
+
+    def parse(self, unit, payload):
+        req, coverage, is_probe = unit
+        if is_probe:
+            records = self.executor.parse(req, payload)
+            result = evaluate_probe(
+                self.supabase, self.commodity_ids, req.market_type_id, req.start, records,
+            )
+            self.probes[(req.market_type_id, req.start)] = result
+            new = set(result.new_provinces)
+            self._held[(req.market_type_id, req.start)] = [r for r in records if r["province_id"] in new]
+            return []
+
+        slice_key = (req.market_type_id, req.start)
+        try:
+            records = self.executor.parse(req, payload, coverage)
+        except Exception:
+            self._failed.add(slice_key)
+            raise
+        self._found[req.market_type_id] = self._found.get(req.market_type_id, 0) + len(records)
+
+        if slice_key in self._remaining:
+            self._remaining[slice_key] -= 1
+            if self._remaining[slice_key] == 0 and slice_key not in self._failed:
+                records = records + self._held.pop(slice_key, [])
+        return records
+
+    def teardown(self):
+        if self.executor is not None:
+            self.executor.save_cost_models()
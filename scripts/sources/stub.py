@@ -0,0 +1,57 @@
+"""
+Offline stub source. Generates deterministic prices without any network
+access, with optional latency and failures, to exercise the ingestion runner:
+
+    python scripts/scraper.py --sources stub --dry-run
+"""
+
+import time
+import random
+
+from bi_reference import BI_TO_BPS_PROVINCE, MARKET_TYPES
+from sources import register_source
+from sources.base import PriceSource
+
+
+@register_source
+class StubSource(PriceSource):
+    """Synthetic prices for every commodity and province, one unit per commodity."""
+
+    name = "stub"
+    min_interval = 0.0
+    enabled_by_default = False
+
+    def __init__(self, latency=0.05, failure_rate=0.0, seed=0):
+        super().__init__()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+    def plan(self, context):
+        day = context.today.strftime("%Y-%m-%d")
+        return [
+            (commodity_id, market_type, day)
+            for commodity_id in sorted(context.commodity_ids.values())
+            for market_type in MARKET_TYPES.values()
+        ]
+
+    def fetch(self, unit):
+        time.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            return None
+        commodity_id, _, _ = unit
+        return {bps: 10_000 + 250 * commodity_id + int(bps) for bps in BI_TO_BPS_PROVINCE.values()}
+
+    def parse(self, unit, payload):
+        commodity_id, market_type, day = unit
+        return [
+            {
+                "commodity_id": commodity_id,
+                "province_id": province_id,
+                "price": float(price),
+                "market_type": market_type,
+                "date": day,
+                "source": self.name,
+            }
+            for province_id, price in payload.items()
+        ]
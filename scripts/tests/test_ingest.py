@@ -0,0 +1,145 @@
+"""
+Offline tests for the ingestion runner, driven by StubSource in dry-run mode.
+
+Run from the repository root: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+from datetime import date
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bi_reference import BI_TO_BPS_PROVINCE, MARKET_TYPES  # noqa: E402
+from ingest import IngestionRunner, WritePipeline  # noqa: E402
+from sources.base import RecordBatch, SourceContext  # noqa: E402
+from sources.stub import StubSource  # noqa: E402
+from writer import WriteResult  # noqa: E402
+
+COMMODITY_IDS = {"beras-premium": 1, "gula-pasir": 2}
+PROVINCES = len(BI_TO_BPS_PROVINCE)
+UNITS = len(COMMODITY_IDS) * len(MARKET_TYPES)
+
+
+class DuplicatingStub(StubSource):
+    """Plans every unit twice."""
+
+    def plan(self, context):
+        units = super().plan(context)
+        return units + units
+
+
+class FailingStub(StubSource):
+    """Fails the first fetch only."""
+
+    name = "failing"
+
+    def fetch(self, unit):
+        if not getattr(self, "_failed_once", False):
+            self._failed_once = True
+            return None
+        return super().fetch(unit)
+
+
+class UpToDateStub(StubSource):
+    """Finds nothing new upstream, like a BI probe with no new provinces."""
+
+    name = "uptodate"
+
+    def plan(self, context):
+        self.stats.skipped = True
+        return []
+
+
+def run(*sources):
+    context = SourceContext(date(2026, 10, 19), COMMODITY_IDS)
+    return IngestionRunner(None, list(sources), dry_run=True).run(context)
+
+
+class IngestionRunnerTest(unittest.TestCase):
+    def test_stub_source_succeeds(self):
+        results = run(StubSource(latency=0))
+        self.assertEqual(results["stub"]["status"], "success")
+        self.assertEqual(results["stub"]["rows_inserted"], UNITS * PROVINCES)
+        self.assertEqual(results["stub"]["provinces_scraped"], PROVINCES)
+        self.assertEqual(results["stub"]["commodities_scraped"], len(COMMODITY_IDS))
+
+    def test_duplicate_records_are_written_once(self):
+        results = run(DuplicatingStub(latency=0))
+        self.assertEqual(results["stub"]["rows_inserted"], UNITS * PROVINCES)
+
+    def test_failed_request_marks_only_that_source_partial(self):
+        results = run(StubSource(latency=0), FailingStub(latency=0))
+        self.assertEqual(results["stub"]["status"], "success")
+        self.assertEqual(results["failing"]["status"], "partial")
+        self.assertEqual(results["failing"]["rows_inserted"], (UNITS - 1) * PROVINCES)
+
+    def test_all_requests_failing_is_failed(self):
+        results = run(StubSource(latency=0, failure_rate=1.0))
+        self.assertEqual(results["stub"]["status"], "failed")
+        self.assertEqual(results["stub"]["rows_inserted"], 0)
+
+    def test_skipped_source_is_not_logged(self):
+        results = run(StubSource(latency=0), UpToDateStub(latency=0))
+        self.assertNotIn("uptodate", results)
+        self.assertEqual(results["stub"]["status"], "success")
+
+
+class BrokenWriter:
+    def write(self, records):
+        raise RuntimeError("database unavailable")
+
+
+class LossyWriter:
+    """Quarantines the first record of every write and fails the second."""
+
+    def write(self, records):
+        result = WriteResult()
+        result.quarantined = [(records[0], "null value in column \"price\"")]
+        result.failed = records[1:2]
+        result.written = records[2:]
+        return result
+
+
+def lossy_pipeline(supabase, dry_run=False):
+    pipeline = WritePipeline(supabase, flush_size=PROVINCES)
+    pipeline.writer = LossyWriter()
+    return pipeline
+
+
+class WritePipelineTest(unittest.TestCase):
+    def test_lost_rows_mark_the_source_partial(self):
+        with mock.patch("ingest.WritePipeline", lossy_pipeline):
+            results = run(StubSource(latency=0))
+        self.assertEqual(results["stub"]["status"], "partial")
+        self.assertEqual(results["stub"]["rows_inserted"], UNITS * (PROVINCES - 2))
+        self.assertEqual(
+            results["stub"]["error_message"],
+            f"{UNITS} rows failed to write; {UNITS} rows quarantined",
+        )
+
+    def test_write_errors_do_not_stop_the_consumer(self):
+        pipeline = WritePipeline(None, flush_size=1)
+        pipeline.writer = BrokenWriter()
+        pipeline.queue.maxsize = 1
+        consumer = threading.Thread(target=pipeline.consume, daemon=True)
+        consumer.start()
+
+        source = StubSource(latency=0)
+        context = SourceContext(date(2026, 10, 19), COMMODITY_IDS)
+        for unit in source.plan(context) * 3:
+            records = source.parse(unit, source.fetch(unit))
+            pipeline.queue.put(RecordBatch(source.name, unit, records), timeout=5)
+        pipeline.queue.put(None, timeout=5)
+        consumer.join(timeout=5)
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(pipeline.error, "database unavailable")
+        self.assertEqual(pipeline.written, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Offline tests for BatchWriter against a fake Supabase client.
+
+Run from the repository root: python -m unittest discover -s scripts/tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+from postgrest.exceptions import APIError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from writer import QUARANTINE_TABLE, BatchSizer, BatchWriter  # noqa: E402
+
+
+def api_error(code, message="error"):
+    return APIError({"code": code, "message": message})
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.rows = None
+
+    def upsert(self, rows, on_conflict=None):
+        self.rows = rows
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        return self.client.execute(self.table, self.rows)
+
+
+class FakeSupabase:
+    """
+    Records every request; `fail(rows)` returns the error a batch of price
+    rows should raise, or None to accept it.
+    """
+
+    def __init__(self, fail=lambda rows: None):
+        self.fail = fail
+        self.requests = []
+        self.stored = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def execute(self, table, rows):
+        with self._lock:
+            self.requests.append((table, len(rows)))
+            error = None if table == QUARANTINE_TABLE else self.fail(rows)
+            if error is not None:
+                raise error
+            self.stored.setdefault(table, []).extend(rows)
+
+
+def records(n):
+    return [{"id": i, "price": 1000 + i} for i in range(n)]
+
+
+def price_requests(client):
+    return [n for table, n in client.requests if table == "prices"]
+
+
+class BatchWriterTest(unittest.TestCase):
+    def test_bad_row_is_quarantined_and_the_rest_written(self):
+        def fail(rows):
+            if any(r["id"] == 1234 for r in rows):
+                return api_error("23502", 'null value in column "price"')
+
+        client = FakeSupabase(fail)
+        result = BatchWriter(client, "prices", "id").write(records(2000))
+
+        self.assertEqual(len(result.written), 1999)
+        self.assertEqual([r["id"] for r, _ in result.quarantined], [1234])
+        self.assertEqual(result.failed, [])
+        self.assertEqual(len(client.stored[QUARANTINE_TABLE]), 1)
+
+    def test_schema_error_fails_every_row_after_one_request(self):
+        client = FakeSupabase(lambda rows: api_error("42P01", 'relation "prices" does not exist'))
+        result = BatchWriter(client, "prices", "id", workers=1).write(records(2000))
+
+        self.assertEqual(len(price_requests(client)), 1)
+        self.assertEqual(len(result.failed), 2000)
+        self.assertEqual(result.written, [])
+        self.assertEqual(result.quarantined, [])
+        self.assertIn("42P01", result.error)
+
+    @mock.patch("writer.time.sleep")
+    def test_gateway_error_is_retried(self, sleep):
+        outages = iter([api_error("503", "Service Unavailable")] * 2)
+        client = FakeSupabase(lambda rows: next(outages, None))
+        result = BatchWriter(client, "prices", "id", workers=1).write(records(100))
+
+        self.assertEqual(price_requests(client), [100, 100, 100])
+        self.assertEqual(len(result.written), 100)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_payload_too_large_shrinks_the_batch_size(self):
+        def fail(rows):
+            if len(rows) > 250:
+                return api_error("413", "Payload Too Large")
+
+        client = FakeSupabase(fail)
+        sizer = BatchSizer(initial=1000)
+        result = BatchWriter(client, "prices", "id", workers=1, sizer=sizer).write(records(1000))
+
+        self.assertLess(sizer.size, 1000)
+        self.assertEqual(len(result.written), 1000)
+        self.assertEqual(result.quarantined, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,240 @@
+"""
+Concurrent, adaptively sized upserts with failed-batch bisection.
+
+BatchWriter keeps several upsert batches in flight over the Supabase
+client's pooled HTTP connections. Batch size grows while batches come back
+fast and shrinks when they get slow or hit the payload limit. When a batch
+is rejected because of its data (a bad value, a constraint violation), it is
+split in half and retried until the offending rows are isolated; those rows
+go to the quarantine table and every other row is still written. Transient
+errors (timeouts, connection drops) are retried with backoff instead.
+"""
+
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_TABLE = "write_quarantine"
+
+# SQLSTATE classes worth retrying as-is: connection (08), transaction
+# rollback (40), insufficient resources (53), operator intervention (57)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+# SQLSTATE classes caused by the rows themselves: data exception (22) and
+# integrity constraint violation (23). Only these are worth bisecting.
+DATA_SQLSTATE_CLASSES = ("22", "23")
+
+try:
+    import httpx
+    NETWORK_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+except ImportError:
+    NETWORK_ERRORS = (ConnectionError, TimeoutError)
+
+
+def is_transient(error):
+    """
+    Whether an upsert error is worth retrying unchanged: network failures and
+    timeouts, gateway errors, and the retryable SQLSTATE classes.
+    """
+    if isinstance(error, NETWORK_ERRORS):
+        return True
+    code = str(getattr(error, "code", None) or "")
+    return code.startswith(TRANSIENT_SQLSTATE_CLASSES) or code in ("502", "503", "504")
+
+
+def is_data_error(error):
+    """
+    Whether a row's values caused the error: a data-class SQLSTATE, or a
+    client-side encoding failure (e.g. NaN is not valid JSON) raised before
+    any request was sent.
+    """
+    code = getattr(error, "code", None)
+    if code is None:
+        return isinstance(error, (ValueError, TypeError))
+    return str(code).startswith(DATA_SQLSTATE_CLASSES)
+
+
+def is_payload_error(error):
+    code = str(getattr(error, "code", None) or "")
+    return code == "413" or "too large" in str(error).lower()
+
+
+class BatchSizer:
+    """
+    Adapts the batch size to observed latency: grow by half while batches
+    finish well under the target, halve when they exceed it or the payload
+    is rejected. Shared by all worker threads.
+    """
+
+    def __init__(self, initial=500, minimum=50, maximum=5000, target_seconds=2.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self._lock = threading.Lock()
+
+    def observe(self, rows, seconds):
+        with self._lock:
+            if rows < self.size // 2:
+                return  # Tail or bisected batch; says little about the current size
+            if seconds > self.target_seconds:
+                self.size = max(self.minimum, self.size // 2)
+            elif seconds < self.target_seconds / 2:
+                self.size = min(self.maximum, int(self.size * 1.5))
+
+    def shrink(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+
+class WriteResult:
+    """Outcome of BatchWriter.write()."""
+
+    def __init__(self):
+        self.written = []       # records upserted
+        self.quarantined = []   # (record, error message) rejected on their own
+        self.failed = []        # records not written because of transient or fatal errors
+        self.error = None       # the error that stopped the write, if one did
+
+    def __len__(self):
+        return len(self.written)
+
+    def summary(self):
+        return (
+            f"{len(self.written)} written, {len(self.quarantined)} quarantined, "
+            f"{len(self.failed)} failed"
+        )
+
+
+class BatchWriter:
+    """Upserts records into one table with concurrent, adaptive, bisecting batches."""
+
+    def __init__(self, supabase, table, on_conflict, workers=4, sizer=None,
+                 max_payload_bytes=1_000_000, retries=3, quarantine=True):
+        self.supabase = supabase
+        self.table = table
+        self.on_conflict = on_conflict
+        self.workers = workers
+        self.sizer = sizer or BatchSizer()
+        self.max_payload_bytes = max_payload_bytes
+        self.retries = retries
+        self.quarantine = quarantine
+        self._lock = threading.Lock()
+        self._fatal = None
+
+    def write(self, records):
+        """Upsert all records. Returns a WriteResult."""
+        result = WriteResult()
+        self._fatal = None
+        records = self._dedupe(records)
+        if not records:
+            return result
+
+        row_bytes = len(json.dumps(records[0], default=str)) + 1
+        payload_cap = max(1, self.max_payload_bytes // row_bytes)
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"upsert-{self.table}") as pool:
+            in_flight = set()
+            offset = 0
+            while offset < len(records) or in_flight:
+                while offset < len(records) and len(in_flight) < self.workers:
+                    size = min(self.sizer.size, payload_cap)
+                    batch = records[offset:offset + size]
+                    offset += len(batch)
+                    in_flight.add(pool.submit(self._write_batch, batch, result))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()  # _write_batch never raises; surface bugs if it does
+
+        if result.quarantined:
+            self._quarantine(result.quarantined)
+        logger.info(f"{self.table}: {result.summary()} (batch size now {self.sizer.size})")
+        return result
+
+    def _dedupe(self, records):
+        """Keep the last record per conflict key; one statement cannot touch a row twice."""
+        if not self.on_conflict:
+            return list(records)
+        columns = [c.strip() for c in self.on_conflict.split(",")]
+        unique = {}
+        for rec in records:
+            unique[tuple(rec.get(c) for c in columns)] = rec
+        return list(unique.values())
+
+    def _upsert(self, batch):
+        query = self.supabase.table(self.table)
+        if self.on_conflict:
+            query.upsert(batch, on_conflict=self.on_conflict).execute()
+        else:
+            query.insert(batch).execute()
+
+    def _write_batch(self, batch, result):
+        """Write one batch, retrying transient errors and bisecting data errors."""
+        for attempt in range(self.retries + 1):
+            if self._fatal is not None:
+                self._fail(batch, result)
+                return
+            started = time.time()
+            try:
+                self._upsert(batch)
+                self.sizer.observe(len(batch), time.time() - started)
+                with self._lock:
+                    result.written.extend(batch)
+                return
+            except Exception as e:
+                error = e
+
+            if is_payload_error(error):
+                self.sizer.shrink()
+                break  # Bisect: halves fit where the whole did not
+            if is_data_error(error):
+                break
+            if not is_transient(error):
+                # Schema, permission or auth errors: no row is to blame
+                with self._lock:
+                    if self._fatal is None:
+                        self._fatal = error
+                        result.error = str(error)
+                        logger.error(f"{self.table}: {error!r}; not writing the remaining rows")
+                self._fail(batch, result)
+                return
+            if attempt < self.retries:
+                delay = 2 ** attempt
+                logger.warning(f"{self.table}: transient error on {len(batch)} rows, retrying in {delay}s: {error}")
+                time.sleep(delay)
+        else:
+            logger.error(f"{self.table}: giving up on {len(batch)} rows after {self.retries} retries: {error}")
+            self._fail(batch, result)
+            return
+
+        if len(batch) == 1:
+            logger.error(f"{self.table}: quarantining row {batch[0]}: {error}")
+            with self._lock:
+                result.quarantined.append((batch[0], str(error)))
+            return
+
+        mid = len(batch) // 2
+        self._write_batch(batch[:mid], result)
+        self._write_batch(batch[mid:], result)
+
+    def _fail(self, batch, result):
+        with self._lock:
+            result.failed.extend(batch)
+
+    def _quarantine(self, rejected):
+        if not self.quarantine:
+            return
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [
+            {"target_table": self.table, "record": record, "error": error[:1000], "created_at": now}
+            for record, error in rejected
+        ]
+        try:
+            self.supabase.table(QUARANTINE_TABLE).insert(rows).execute()
+        except Exception as e:
+            logger.error(f"Failed to quarantine {len(rows)} rows: {e}")
@@ -17,31 +17,22 @@ export default async function AdminPage() {
     .order("created_at", { ascending: false })
     .limit(20);
 
-  // Get data coverage for today
-  const { data: latestRow } = await supabase
-    .from("prices")
-    .select("date")
+  // Latest coverage row, maintained by the scraper as it writes prices
+  const { data: summary } = await supabase
+    .from("coverage_summary")
+    .select("date, province_count, commodity_count, row_count")
+    .eq("market_type", "traditional")
+    .eq("source", "bi")
     .order("date", { ascending: false })
-    .limit(1);
-
-  const latestDate = latestRow?.[0]?.date || null;
-
-  let coverage = { provinces: 0, commodities: 0, total: 0 };
-  if (latestDate) {
-    const { data: prices } = await supabase
-      .from("prices")
-      .select("commodity_id, province_id")
-      .eq("date", latestDate)
-      .eq("market_type", "traditional");
-
-    if (prices) {
-      coverage = {
-        provinces: new Set(prices.map((p) => p.province_id)).size,
-        commodities: new Set(prices.map((p) => p.commodity_id)).size,
-        total: prices.length,
-      };
-    }
-  }
+    .limit(1)
+    .maybeSingle();
+
+  const latestDate = summary?.date || null;
+  const coverage = {
+    provinces: summary?.province_count || 0,
+    commodities: summary?.commodity_count || 0,
+    total: summary?.row_count || 0,
+  };
 
   return (
     <AdminClient
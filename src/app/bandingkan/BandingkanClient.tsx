@@ -12,8 +12,8 @@ import {
   Legend,
 } from "recharts";
 import { supabase } from "@/lib/supabase";
-import { formatRupiah, formatDateShort, formatPrice } from "@/lib/utils";
-import type { Commodity, Province, TrendPoint } from "@/lib/types";
+import { formatRupiah, formatDateShort, formatPrice, formatPct } from "@/lib/utils";
+import type { Commodity, Province, ProvinceGap, TrendPoint } from "@/lib/types";
 
 const COLORS = ["#029746", "#ee8d00", "#dc2626", "#6366f1"];
 
@@ -30,6 +30,7 @@ export function BandingkanClient({ commodities, provinces }: Props) {
   const [range, setRange] = useState(30);
   const [chartData, setChartData] = useState<any[]>([]);
   const [loading, setLoading] = useState(false);
+  const [gaps, setGaps] = useState<ProvinceGap | null>(null);
 
   const toggleProvince = (id: string) => {
     setSelectedProvinces((prev) =>
@@ -77,6 +78,50 @@ export function BandingkanClient({ commodities, provinces }: Props) {
     fetchData();
   }, [selectedCommodity, selectedProvinces, range]);
 
+  // Precomputed gap matrices: one row per commodity, every pair is a lookup
+  useEffect(() => {
+    if (!selectedCommodity) {
+      setGaps(null);
+      return;
+    }
+    supabase
+      .from("province_gaps")
+      .select("*")
+      .eq("commodity_id", selectedCommodity)
+      .eq("market_type", "traditional")
+      .maybeSingle()
+      .then(({ data }) => setGaps(data));
+  }, [selectedCommodity]);
+
+  const gapPairs = useMemo(() => {
+    if (!gaps) return [];
+    const size = gaps.province_order.length;
+    const index = new Map(gaps.province_order.map((id, i) => [id, i]));
+    const pairs: {
+      from: string;
+      to: string;
+      diff: number | null;
+      pct: number | null;
+      avg30: number | null;
+    }[] = [];
+    for (let a = 0; a < selectedProvinces.length; a++) {
+      for (let b = a + 1; b < selectedProvinces.length; b++) {
+        const i = index.get(selectedProvinces[a]);
+        const j = index.get(selectedProvinces[b]);
+        if (i === undefined || j === undefined) continue;
+        const k = i * size + j;
+        pairs.push({
+          from: selectedProvinces[a],
+          to: selectedProvinces[b],
+          diff: gaps.diff[k],
+          pct: gaps.pct_gap[k],
+          avg30: gaps.avg_gap_30[k],
+        });
+      }
+    }
+    return pairs;
+  }, [gaps, selectedProvinces]);
+
   const selectedProvNames = useMemo(() => {
     const map = new Map(provinces.map((p) => [p.id, p.name]));
     return selectedProvinces.map((id) => ({ id, name: map.get(id) || id }));
@@ -258,6 +303,42 @@ export function BandingkanClient({ commodities, provinces }: Props) {
               </>
             )}
           </div>
+
+          {gapPairs.length > 0 && (
+            <div className="card p-4 sm:p-6 mt-6">
+              <h2 className="text-sm font-semibold text-warm-700 mb-1">Selisih Harga</h2>
+              <p className="text-xs text-warm-400 mb-3">
+                Pasar tradisional, harga terakhir per {formatDateShort(gaps!.date)}
+              </p>
+              <div className="divide-y divide-warm-100">
+                {gapPairs.map((pair) => {
+                  const name = (id: string) => provinces.find((p) => p.id === id)?.name || id;
+                  return (
+                    <div
+                      key={`${pair.from}-${pair.to}`}
+                      className="py-2 flex flex-wrap items-center justify-between gap-2 text-sm"
+                    >
+                      <span className="text-warm-600">
+                        {name(pair.from)} vs {name(pair.to)}
+                      </span>
+                      <span className="text-warm-800 font-medium">
+                        {pair.diff === null
+                          ? "-"
+                          : `${pair.diff < 0 ? "-" : ""}${formatRupiah(Math.abs(pair.diff))}`}{" "}
+                        <span className="text-warm-400 font-normal">
+                          ({formatPct(pair.pct)}, rata-rata 30 hari{" "}
+                          {pair.avg30 === null
+                            ? "-"
+                            : `${pair.avg30 < 0 ? "-" : ""}${formatRupiah(Math.abs(pair.avg30))}`}
+                          )
+                        </span>
+                      </span>
+                    </div>
+                  );
+                })}
+              </div>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -45,6 +45,67 @@ export interface NationalAverage {
   province_count: number;
 }
 
+// Rolling statistics per series; province_id "00" is the national series
+export interface PriceStat {
+  commodity_id: number;
+  province_id: string;
+  market_type: string;
+  date: string;
+  price: number;
+  ma_7: number | null;
+  ma_30: number | null;
+  ma_90: number | null;
+  std_7: number | null;
+  std_30: number | null;
+  std_90: number | null;
+  change_wow: number | null;
+  change_mom: number | null;
+  change_yoy: number | null;
+}
+
+// Per-date coverage maintained by scripts/coverage.py; missing_bitmap is hex,
+// bit (commodity index * province_order.length + province index)
+export interface CoverageSummary {
+  date: string;
+  market_type: string;
+  source: string;
+  province_count: number;
+  commodity_count: number;
+  row_count: number;
+  expected_cells: number;
+  missing_bitmap: string;
+  commodity_order: number[];
+  province_order: string[];
+  updated_at: string;
+}
+
+// All-pairs province gaps maintained by scripts/province_gaps.py; matrices
+// are flattened row-major, gap of province i over j at i * length + j
+export interface ProvinceGap {
+  market_type: string;
+  commodity_id: number;
+  date: string;
+  province_order: string[];
+  latest_prices: (number | null)[];
+  diff: (number | null)[];
+  pct_gap: (number | null)[];
+  avg_gap_30: (number | null)[];
+  updated_at: string;
+}
+
+// Forecasts from scripts/forecast.py; forecast[h - 1] is the price for date + h days
+export interface PriceForecast {
+  commodity_id: number;
+  province_id: string;
+  market_type: string;
+  date: string;
+  forecast: (number | null)[];
+  rmse: number | null;
+  params: number[];
+  state_date: string;
+  updated_at: string;
+}
+
 export interface ScrapeLog {
   id: number;
   scrape_date: string;